@@ -0,0 +1,94 @@
+import json
+import time
+import pickle
+import random
+import string
+import msgpack
+import orjson
+import pyzstd
+import lz4.frame
+from prettytable import PrettyTable
+
+# Сравнение кодеков кэша (util/cache_codec.py): CPU на кодирование/декодирование и байты в Redis.
+# Redis не нужен — измеряется только то, что делает воркер на каждый промах/попадание.
+ITERATIONS = 2000
+COMPRESS_MIN_LENGTH = 1024  # как CACHE_COMPRESS_MIN_LENGTH в settings.py
+
+def random_text(length: int) -> str:
+    words = [''.join(random.choices(string.ascii_lowercase, k=random.randint(2, 9))) for _ in range(500)]
+    text = ""
+    while len(text) < length:
+        text += random.choice(words) + " "
+    return text[:length]
+
+def make_note(content_length: int) -> dict:
+    """Заметка в том виде, в каком её кладёт в кэш NoteAPI.retrieve (serializer.data)."""
+    return {
+        "note_id": ''.join(random.choices(string.ascii_letters + string.digits, k=8)),
+        "user": ''.join(random.choices(string.ascii_letters + string.digits, k=8)),
+        "created_at": "2025-07-01T12:00:00.000000Z",
+        "dead_line": "9999-12-31T00:00:00Z",
+        "only_authorized": False,
+        "to_comment": None,
+        "burn_after_read": False,
+        "is_burned": False,
+        "is_public": True,
+        "content": random_text(content_length),
+    }
+
+def make_search_result() -> dict:
+    """Ответ Meilisearch, который кэширует SearchNote."""
+    return {
+        "hits": [{"id": str(i), "content": random_text(300)} for i in range(10)],
+        "query": "note", "processingTimeMs": 1, "limit": 10, "offset": 0, "estimatedTotalHits": 1000,
+    }
+
+SERIALIZERS = {
+    "pickle": (lambda v: pickle.dumps(v, pickle.HIGHEST_PROTOCOL), pickle.loads),
+    "json (было в SearchNote)": (lambda v: json.dumps(v).encode(), json.loads),
+    "msgpack": (msgpack.dumps, lambda b: msgpack.loads(b, raw=False)),
+    "orjson": (orjson.dumps, orjson.loads),
+}
+
+COMPRESSORS = {
+    "none": (lambda b: b, lambda b: b),
+    "zstd": (pyzstd.compress, pyzstd.decompress),
+    "lz4": (lz4.frame.compress, lz4.frame.decompress),
+}
+
+def bench(value, dumps, loads, compress, decompress) -> tuple[float, float, int]:
+    def encode(v):
+        raw = dumps(v)
+        return (compress(raw), True) if len(raw) > COMPRESS_MIN_LENGTH else (raw, False)
+
+    def decode(b, compressed):
+        return loads(decompress(b) if compressed else b)
+
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        encoded, compressed = encode(value)
+    encode_time = (time.perf_counter() - start) / ITERATIONS
+
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        decode(encoded, compressed)
+    decode_time = (time.perf_counter() - start) / ITERATIONS
+
+    return encode_time, decode_time, len(encoded)
+
+if __name__ == "__main__":
+    payloads = {
+        "заметка 200 Б": make_note(200),
+        "заметка 5 КБ": make_note(5_000),
+        "заметка 100 КБ": make_note(100_000),
+        "поиск (10 хитов)": make_search_result(),
+    }
+
+    for name, value in payloads.items():
+        table = PrettyTable(["Кодек", "Сжатие", "encode, мкс", "decode, мкс", "Байт"])
+        table.title = name
+        for s_name, (dumps, loads) in SERIALIZERS.items():
+            for c_name, (compress, decompress) in COMPRESSORS.items():
+                enc, dec, size = bench(value, dumps, loads, compress, decompress)
+                table.add_row([s_name, c_name, f"{enc * 1e6:.1f}", f"{dec * 1e6:.1f}", size])
+        print(table)
@@ -0,0 +1,79 @@
+import time
+import random
+import string
+import argparse
+import threading
+import requests
+from loguru import logger
+
+# Сравнение режимов gunicorn: запускать против пода с GUNICORN_WORKER_CLASS=sync и =gevent
+BASE_URL = "http://localhost:5000/api"
+USERNAME = "bench_" + ''.join(random.choices(string.ascii_lowercase + string.digits, k=6))
+PASSWORD = "testpassword123"
+
+stats = {"ok": 0, "errors": 0, "latencies": [], "lock": threading.Lock()}
+
+def prepare_notes(count: int) -> list[str]:
+    """Регистрирует пользователя и создаёт публичные заметки для чтения."""
+    session = requests.Session()
+    session.get(f"{BASE_URL}/login/")
+    session.headers.update({"X-CSRFToken": session.cookies.get("csrftoken", "")})
+    session.post(f"{BASE_URL}/register/", data={"username": USERNAME, "password": PASSWORD}).raise_for_status()
+    session.headers.update({"X-CSRFToken": session.cookies.get("csrftoken", "")})
+
+    note_ids = []
+    for i in range(count):
+        response = session.post(f"{BASE_URL}/notes/", json={
+            "content": f"Note {i} " + ''.join(random.choices(string.ascii_letters, k=2000)),
+            "is_public": True,
+        })
+        response.raise_for_status()
+        note_ids.append(response.json()["note_id"])
+    logger.info(f"Создано заметок: {len(note_ids)}")
+    return note_ids
+
+def reader(note_ids: list[str], end_time: float):
+    """Смешанная нагрузка: чтение заметок и поиск."""
+    session = requests.Session()
+    while time.time() < end_time:
+        if random.random() < 0.8:
+            url = f"{BASE_URL}/notes/{random.choice(note_ids)}/"
+        else:
+            url = f"{BASE_URL}/notes/search/?q=Note {random.randint(0, 1000)}"
+        start = time.perf_counter()
+        try:
+            ok = session.get(url, timeout=30).status_code == 200
+        except Exception as e:
+            logger.warning(f"Ошибка запроса: {e}")
+            ok = False
+        latency = time.perf_counter() - start
+
+        with stats["lock"]:
+            stats["ok" if ok else "errors"] += 1
+            stats["latencies"].append(latency)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Конкурентное чтение заметок (sync vs gevent/ASGI)")
+    parser.add_argument("--label", default="current", help="Метка прогона (sync, gevent, asgi)")
+    parser.add_argument("--clients", type=int, default=200, help="Одновременных клиентов")
+    parser.add_argument("--notes", type=int, default=50, help="Сколько заметок создать")
+    parser.add_argument("--duration", type=int, default=30, help="Длительность в секундах")
+    args = parser.parse_args()
+
+    note_ids = prepare_notes(args.notes)
+
+    end_time = time.time() + args.duration
+    threads = [threading.Thread(target=reader, args=(note_ids, end_time)) for _ in range(args.clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    latencies = sorted(stats["latencies"])
+    total = stats["ok"] + stats["errors"]
+    logger.info(f"[{args.label}] Клиентов: {args.clients}, запросов: {total}, ошибок: {stats['errors']}")
+    logger.info(f"[{args.label}] RPS: {total / args.duration:.1f}")
+    if latencies:
+        logger.info(f"[{args.label}] p50: {latencies[len(latencies) // 2] * 1000:.1f} мс, "
+                    f"p95: {latencies[int(len(latencies) * 0.95)] * 1000:.1f} мс, "
+                    f"p99: {latencies[int(len(latencies) * 0.99)] * 1000:.1f} мс")
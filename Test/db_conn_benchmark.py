@@ -0,0 +1,57 @@
+import time
+import argparse
+import threading
+import requests
+
+# ==== Конфигурация ====
+# Запускать дважды: с DB_CONN_MAX_AGE=0 (было) и с постоянными соединениями / pgbouncer (стало)
+BASE_URL = "http://localhost:5000/api"
+ENDPOINTS = ["/notes/", "/notes/random/"]  # эндпоинты, каждый запрос которых ходит в БД
+NUM_THREADS = 20
+DURATION = 30  # секунд
+
+stats = {"ok": 0, "errors": 0, "latencies": [], "lock": threading.Lock()}
+
+# ==== Функция для потока ====
+def worker(end_time: float):
+    session = requests.Session()
+    i = 0
+    while time.time() < end_time:
+        url = BASE_URL + ENDPOINTS[i % len(ENDPOINTS)]
+        i += 1
+        start = time.perf_counter()
+        try:
+            response = session.get(url, timeout=10)
+            ok = response.status_code in (200, 404)
+        except Exception as e:
+            print(f"Error: {e}")
+            ok = False
+        latency = time.perf_counter() - start
+
+        with stats["lock"]:
+            stats["ok" if ok else "errors"] += 1
+            stats["latencies"].append(latency)
+
+# ==== Запуск нагрузки ====
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="RPS Django API при разных режимах подключения к БД")
+    parser.add_argument("--label", default="current", help="Метка прогона (например, conn_max_age=0)")
+    parser.add_argument("--threads", type=int, default=NUM_THREADS)
+    parser.add_argument("--duration", type=int, default=DURATION)
+    args = parser.parse_args()
+
+    print(f"[{args.label}] {args.threads} потоков, {args.duration} с...")
+    end_time = time.time() + args.duration
+    threads = [threading.Thread(target=worker, args=(end_time,)) for _ in range(args.threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    latencies = sorted(stats["latencies"])
+    total = stats["ok"] + stats["errors"]
+    print(f"[{args.label}] Всего запросов: {total}, ошибок: {stats['errors']}")
+    print(f"[{args.label}] RPS: {total / args.duration:.1f}")
+    if latencies:
+        print(f"[{args.label}] p50: {latencies[len(latencies) // 2] * 1000:.1f} мс, "
+              f"p95: {latencies[int(len(latencies) * 0.95)] * 1000:.1f} мс")
@@ -0,0 +1,83 @@
+import time
+import random
+import string
+from meilisearch import Client
+from rich.console import Console
+from rich.table import Table
+from rich.progress import track
+
+# ==================== Настройки ====================
+MEILISEARCH_URL = "http://localhost:7700"
+API_KEY = ""  # Укажите, если включена аутентификация
+INDEX_UID = "notes"
+COLD_STARTS = 200  # Сколько «холодных» воркеров имитируем
+EXPECTED_ATTRIBUTES = ["id", "content"]
+console = Console()
+
+# ==================== Вспомогательные функции ====================
+
+def random_word(length=5):
+    return ''.join(random.choices(string.ascii_lowercase, k=length))
+
+def first_search_old(word: str) -> float:
+    """
+    Первый поиск в новом процессе по старой схеме:
+    get_settings() + сравнение настроек + search.
+    """
+    start = time.perf_counter()
+    client = Client(MEILISEARCH_URL, API_KEY or None, timeout=15)
+    index = client.index(INDEX_UID)
+    current = index.get_settings()
+    if (current.get("searchableAttributes") != EXPECTED_ATTRIBUTES or
+            current.get("displayedAttributes") != EXPECTED_ATTRIBUTES):
+        console.print("[yellow]Настройки индекса отличаются — запустите manage.py init_meilisearch")
+    index.search(word, {"limit": 10})
+    return time.perf_counter() - start
+
+def first_search_new(word: str) -> float:
+    """
+    Первый поиск в новом процессе по новой схеме:
+    индекс уже подготовлен, воркер только получает хэндл и ищет.
+    """
+    start = time.perf_counter()
+    client = Client(MEILISEARCH_URL, API_KEY or None, timeout=15)
+    index = client.index(INDEX_UID)
+    index.search(word, {"limit": 10})
+    return time.perf_counter() - start
+
+def stats(samples: list[float]) -> tuple[float, float]:
+    ordered = sorted(samples)
+    return sum(ordered) / len(ordered), ordered[int(len(ordered) * 0.95)]
+
+# ==================== Основная логика ====================
+
+def main():
+    console.rule("[bold blue]Холодный старт поиска Meilisearch")
+
+    old_times, new_times = [], []
+    for _ in track(range(COLD_STARTS), description="Имитация холодных воркеров"):
+        word = random_word(random.randint(2, 6))
+        # Чередуем порядок, чтобы не давать преимущество прогретому серверу
+        if random.random() < 0.5:
+            old_times.append(first_search_old(word))
+            new_times.append(first_search_new(word))
+        else:
+            new_times.append(first_search_new(word))
+            old_times.append(first_search_old(word))
+
+    old_avg, old_p95 = stats(old_times)
+    new_avg, new_p95 = stats(new_times)
+
+    table = Table(title="📊 Первый запрос в воркере")
+    table.add_column("Схема", style="cyan")
+    table.add_column("Среднее", style="magenta")
+    table.add_column("P95", style="magenta")
+
+    table.add_row("get_settings + search (было)", f"{old_avg * 1000:.2f} мс", f"{old_p95 * 1000:.2f} мс")
+    table.add_row("search (стало)", f"{new_avg * 1000:.2f} мс", f"{new_p95 * 1000:.2f} мс")
+
+    console.print(table)
+    console.rule("[bold green]Тестирование завершено")
+
+if __name__ == "__main__":
+    main()
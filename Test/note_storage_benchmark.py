@@ -0,0 +1,128 @@
+import os
+import gzip
+import time
+import random
+import argparse
+import statistics
+import boto3
+import pyzstd
+from prettytable import PrettyTable
+
+# Кодеки хранения текстов заметок в MinIO (util/note_codec.py): байты в бакете и задержка чтения.
+# Без --minio измеряется только CPU на сжатие/разжатие; с --minio каждый текст
+# загружается в бакет и читается обратно (GET + разжатие), как в Note.get_content_text.
+MINIO_URL = os.getenv("MINIO_URL", "http://localhost:9000")
+BUCKET = os.getenv("MINIO_BUCKET", "content")
+COMPRESS_MIN_SIZE = 64              # как NOTE_COMPRESS_MIN_SIZE в settings.py
+ZSTD_DICT_MAX_SIZE = 16 * 1024      # как NOTE_ZSTD_DICT_MAX_SIZE
+DICT_SIZE = 110 * 1024
+
+WORDS = (
+    "заметка список дел купить молоко встреча завтра в 10:00 позвонить проект отчёт "
+    "todo done fix deploy redis minio kubernetes pod cache ссылка https://example.com "
+    "пароль не хранить идея черновик глава книга рецепт соль сахар мука 200 г"
+).split()
+
+def make_text(length: int) -> bytes:
+    """Текст, похожий на заметку: строки из общего словаря, маркеры списков и заголовки."""
+    lines = []
+    size = 0
+    while size < length:
+        line = random.choice(["- ", "* ", "# ", "", "", ""]) + " ".join(random.choices(WORDS, k=random.randint(3, 12)))
+        lines.append(line)
+        size += len(line.encode()) + 1
+    return "\n".join(lines).encode()[:length]
+
+def make_corpus(count: int) -> list[bytes]:
+    # Большинство заметок короткие, немногие — длинные
+    return [make_text(int(random.lognormvariate(6.5, 1.2)) + 1) for _ in range(count)]
+
+def build_codecs(train: list[bytes]) -> dict:
+    zstd_dict = pyzstd.train_dict([t for t in train if len(t) <= ZSTD_DICT_MAX_SIZE], DICT_SIZE)
+
+    def zstd_dict_encode(data: bytes) -> bytes:
+        return pyzstd.compress(data, 3, zstd_dict.as_digested_dict if len(data) <= ZSTD_DICT_MAX_SIZE else None)
+
+    return {
+        "none": (lambda b: b, lambda b: b),
+        "gzip": (lambda b: gzip.compress(b, compresslevel=6, mtime=0), gzip.decompress),
+        "zstd": (lambda b: pyzstd.compress(b, 3), pyzstd.decompress),
+        "zstd + словарь": (zstd_dict_encode, lambda b: pyzstd.decompress(b, zstd_dict)),
+    }
+
+def encode(data: bytes, compress) -> tuple[bytes, bool]:
+    """Как encode_note_body: короткие и несжимаемые тексты хранятся как есть."""
+    if len(data) < COMPRESS_MIN_SIZE:
+        return data, False
+    encoded = compress(data)
+    return (data, False) if len(encoded) >= len(data) else (encoded, True)
+
+def percentile(values: list[float], p: float) -> float:
+    return sorted(values)[min(len(values) - 1, int(len(values) * p))]
+
+def bench(corpus: list[bytes], compress, decompress, client=None, prefix: str = "") -> dict:
+    stored = []
+    start = time.perf_counter()
+    for data in corpus:
+        stored.append(encode(data, compress))
+    encode_time = (time.perf_counter() - start) / len(corpus)
+
+    start = time.perf_counter()
+    for body, compressed in stored:
+        decompress(body) if compressed else body
+    decode_time = (time.perf_counter() - start) / len(corpus)
+
+    latencies = []
+    if client is not None:
+        for i, (body, _) in enumerate(stored):
+            client.put_object(Bucket=BUCKET, Key=f"{prefix}{i}.txt", Body=body)
+        for i, (_, compressed) in enumerate(stored):
+            start = time.perf_counter()
+            body = client.get_object(Bucket=BUCKET, Key=f"{prefix}{i}.txt")["Body"].read()
+            decompress(body) if compressed else body
+            latencies.append(time.perf_counter() - start)
+        for i in range(len(stored)):
+            client.delete_object(Bucket=BUCKET, Key=f"{prefix}{i}.txt")
+
+    return {
+        "bytes": sum(len(body) for body, _ in stored),
+        "encode": encode_time,
+        "decode": decode_time,
+        "latencies": latencies,
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Сжатие текстов заметок в MinIO: размер и задержка чтения")
+    parser.add_argument("--notes", type=int, default=2000, help="Сколько заметок в тестовой выборке")
+    parser.add_argument("--minio", action="store_true", help="Загружать и читать тексты из MinIO (MINIO_URL)")
+    args = parser.parse_args()
+
+    random.seed(42)
+    train = make_corpus(5000)
+    corpus = make_corpus(args.notes)
+    raw_bytes = sum(len(t) for t in corpus)
+
+    client = None
+    if args.minio:
+        client = boto3.client(
+            "s3",
+            endpoint_url=MINIO_URL,
+            aws_access_key_id=os.getenv("MINIO_ACCESS_KEY", "minioadmin"),
+            aws_secret_access_key=os.getenv("MINIO_SECRET_KEY", "minioadmin"),
+        )
+
+    table = PrettyTable(["Кодек", "Байт в MinIO", "Сжатие", "encode, мкс", "decode, мкс", "GET p50, мс", "GET p99, мс"])
+    table.title = f"{len(corpus)} заметок, {raw_bytes} байт текста"
+    for name, (compress, decompress) in build_codecs(train).items():
+        result = bench(corpus, compress, decompress, client, prefix=f"bench-{name.replace(' ', '')}-")
+        latencies = result["latencies"]
+        table.add_row([
+            name,
+            result["bytes"],
+            f"{raw_bytes / result['bytes']:.2f}x",
+            f"{result['encode'] * 1e6:.1f}",
+            f"{result['decode'] * 1e6:.1f}",
+            f"{statistics.median(latencies) * 1e3:.2f}" if latencies else "-",
+            f"{percentile(latencies, 0.99) * 1e3:.2f}" if latencies else "-",
+        ])
+    print(table)
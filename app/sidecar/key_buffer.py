@@ -1,7 +1,7 @@
 import os
 import time
 import threading
-from flask import Flask, jsonify
+from flask import Flask, jsonify, request
 import redis
 from loguru import logger
 import queue
@@ -14,6 +14,7 @@ BUFFER_KEY_SET = os.environ.get("BUFFER_KEY_SET", "buffer_keys")  # имя мн
 USED_KEY_ZSET = os.environ.get("USED_KEY_ZSET", "used_keys")      # имя сортированного множества для выданных ключей
 FLASK_PORT = int(os.environ.get("FLASK_PORT", 8000))              # порт, на котором работает Flask-сервер
 PROMETHEUS_URL = os.environ.get("PROMETHEUS_URL")                  # URL Prometheus (например http://prometheus:9090)
+MAX_KEYS_PER_REQUEST = int(os.environ.get("MAX_KEYS_PER_REQUEST", 1000))  # максимум ключей за один /get-keys
 
 # === Подключение к Redis ===
 r = redis.Redis.from_url(REDIS_URL)
@@ -158,6 +159,47 @@ def get_key():
         return jsonify({"error": "Нет доступных ключей"}), 503
 
 
+def reserve_keys_from_redis(count: int) -> list[str]:
+    """Атомарно резервирует до count ключей прямо из Redis тем же Lua-скриптом, минуя L2-кэш."""
+    now = int(time.time())
+    keys = r.eval(LUA_SCRIPT, 2, BUFFER_KEY_SET, USED_KEY_ZSET, count, now)
+    return [key.decode("utf-8") for key in keys]
+
+
+@app.route("/get-keys", methods=["GET"])
+def get_keys():
+    """Выдаёт сразу несколько ключей: сначала из L2-кэша, недостающие — одним вызовом к Redis."""
+    try:
+        count = int(request.args.get("count", 1))
+    except ValueError:
+        return jsonify({"error": "count должен быть числом"}), 400
+    if not 1 <= count <= MAX_KEYS_PER_REQUEST:
+        return jsonify({"error": f"count должен быть от 1 до {MAX_KEYS_PER_REQUEST}"}), 400
+
+    keys = []
+    while len(keys) < count:
+        try:
+            keys.append(l2_cache.get_nowait())
+        except queue.Empty:
+            break
+
+    if len(keys) < count:
+        try:
+            keys.extend(reserve_keys_from_redis(count - len(keys)))
+        except redis.RedisError as e:
+            logger.error(f"❌ Ошибка резервирования ключей в Redis: {e}")
+
+    if len(keys) < count:
+        # Не выдаём частичный набор: возвращаем взятое обратно в L2-кэш
+        for key in keys:
+            l2_cache.put(key)
+        logger.warning(f"🚫 Недостаточно ключей: запрошено {count}, доступно {len(keys)}. Возвращаем 503.")
+        return jsonify({"error": "Недостаточно доступных ключей"}), 503
+
+    logger.info(f"✅ Выдано ключей клиенту: {count}")
+    return jsonify({"keys": keys})
+
+
 if __name__ == "__main__":
     logger.info("🚀 Запуск Flask-сервера и фонового потока пополнения L2-кэша...")
 
@@ -7,3 +7,4 @@ class AppConfig(AppConfig):
 
     def ready(self):
         import app.signals  # важно: импортировать сигналы при старте
+        import app.checks  # проверка словаря zstd (manage.py check --tag note_codec)
@@ -0,0 +1,338 @@
+"""
+Асинхронные версии представлений чтения (включаются при ASYNC_VIEWS, обслуживаются через config/asgi.py).
+
+Независимые обращения к Redis, PostgreSQL, MinIO и Meilisearch выполняются
+в event loop и не блокируют друг друга и соседние запросы воркера.
+"""
+import asyncio
+import hashlib
+import logging
+from typing import Any
+
+from adrf.views import APIView
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from meilisearch.errors import MeilisearchApiError, MeilisearchCommunicationError
+from rest_framework import exceptions, status
+from rest_framework.permissions import IsAuthenticatedOrReadOnly
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from config.db_router import stale_reads
+from util.cache import (
+    async_rcache,
+    async_wcache,
+    afetch_single_flight,
+    MISSING,
+    jittered_timeout,
+    missing_note_key,
+    note_cache_key,
+    note_meta_cache_key,
+    acached_notes_data,
+    NOTE_CACHE_TIMEOUT,
+    NOTE_MISSING_CACHE_TIMEOUT,
+)
+from util.check_note import acheck_note_owner, check_note
+from util.meilisearch import get_meilisearch_index
+from util.norm import normalize_string
+
+from .models import Note
+from .pagination import CommentPagination, SearchNotePagination
+from .serializer import NoteSerializer
+from .views import NoteAPI, note_response, read_note_text
+
+logger = logging.getLogger("myapp")
+
+
+def _serialize(note: Note) -> dict:
+    return NoteSerializer(note).data
+
+
+# Сериализация читает тело заметки из MinIO — выполняем вне event loop,
+# не привязываясь к общему потоку ORM, чтобы тела скачивались параллельно
+serialize_note = sync_to_async(_serialize, thread_sensitive=False)
+
+
+def _is_authenticated(user) -> bool:
+    return bool(user and user.is_authenticated)
+
+
+class AsyncNoteDetail(APIView):
+    """
+    Асинхронный NoteAPI.retrieve с той же семантикой кэша, check_note, burn_after_read и ETag.
+
+    Изменение и удаление делегируются синхронному NoteAPI.
+    """
+    permission_classes = [IsAuthenticatedOrReadOnly]
+
+    write_view = staticmethod(NoteAPI.as_view({
+        "put": "update",
+        "patch": "partial_update",
+        "delete": "destroy",
+    }))
+
+    async def get(self, request: Request, pk: str) -> Response:
+        presigned = settings.NOTE_CONTENT_DELIVERY == "presigned"
+        cache_key = note_meta_cache_key(pk) if presigned else note_cache_key(pk)
+        missing_key = missing_note_key(pk)
+
+        # Проверка в кэше: сама заметка или отметка о её отсутствии (один MGET)
+        cached = await async_rcache().get_many([cache_key, missing_key])
+        if missing_key in cached:
+            logger.info(f"Заметка {pk} отмечена в кэше как отсутствующая.")
+            raise exceptions.NotFound("No Note matches the given query.")
+
+        cached_data = cached.get(cache_key)
+        if cached_data is None:
+            # Если нет в кэше — достаём из БД (single-flight)
+            data, from_cache = await afetch_single_flight(
+                cache_key, lambda: self._build(request, pk, presigned), missing_key
+            )
+            if data is MISSING:
+                raise exceptions.NotFound("No Note matches the given query.")
+            if not from_cache:
+                return note_response(request, data)
+            cached_data = data
+
+        logger.info(f"Заметка {pk} найдена в кэше.")
+        check_note(
+            dead_line=parse_datetime(cached_data["dead_line"]),
+            only_authorized=cached_data["only_authorized"],
+            note_id=pk,
+            user=request.user
+        )
+        await acheck_note_owner(cached_data["user"], pk)
+        return note_response(request, cached_data)
+
+    async def _build(self, request: Request, pk: str, presigned: bool) -> tuple[dict, int | None]:
+        note = await Note.objects.filter(note_id=pk, is_burned=False).afirst()
+        try:
+            if note is None:
+                raise exceptions.NotFound("No Note matches the given query.")
+            check_note(note.dead_line, note.only_authorized, note.note_id, request.user)
+            await acheck_note_owner(note.user_id, note.note_id)
+        except exceptions.NotFound:
+            # Нет, истекла или сожжена — запоминаем, чтобы не ходить в БД повторно
+            await async_wcache().set(missing_note_key(pk), 1, timeout=NOTE_MISSING_CACHE_TIMEOUT)
+            raise
+
+        if note.burn_after_read:
+            # Сначала текст: при ошибке MinIO заметка не должна сгореть
+            note.preloaded_content = await sync_to_async(read_note_text, thread_sensitive=False)(note)
+            note.is_burned = True
+            await note.asave(update_fields=["is_burned"])
+            data = await serialize_note(note)
+            logger.info(f"Заметка {pk} была сожжена после прочтения.")
+            return data, None
+
+        logger.info(f"Заметка {pk} получена из БД.")
+        if presigned:
+            # Текст не читаем: клиент скачает его по ссылке прямо из MinIO
+            meta = NoteSerializer(note, context={"include_content": False}).data
+            return {**meta, "content_key": note.content.name}, NOTE_CACHE_TIMEOUT
+        return await serialize_note(note), NOTE_CACHE_TIMEOUT
+
+    async def put(self, request: Request, pk: str) -> Response:
+        return await self._delegate(request, pk)
+
+    async def patch(self, request: Request, pk: str) -> Response:
+        return await self._delegate(request, pk)
+
+    async def delete(self, request: Request, pk: str) -> Response:
+        return await self._delegate(request, pk)
+
+    async def _delegate(self, request: Request, pk: str) -> Response:
+        return await sync_to_async(self.write_view)(request._request, pk=pk)
+
+
+class AsyncSearchNote(APIView):
+    """
+    Асинхронный SearchNote: кэш через redis.asyncio, поиск в Meilisearch вне event loop.
+    """
+
+    pagination_class = SearchNotePagination
+
+    async def get(self, request: Request) -> Response:
+        query: str = request.query_params.get("q", "").strip()
+
+        if not query:
+            logger.warning("Отсутствует обязательный параметр 'q'")
+            return Response(
+                {"error": "Missing required query parameter 'q'"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        paginator = self.pagination_class()
+
+        try:
+            limit: int = paginator.get_limit(request)
+            offset: int = paginator.get_offset(request)
+
+            if limit is None or offset is None:
+                logger.warning(f"Некорректные параметры пагинации: limit={limit}, offset={offset}")
+                return Response(
+                    {"error": "Invalid pagination parameters"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+            # Формируем ключ кэша
+            raw_key = f"{normalize_string(query)}:{limit}:{offset}"
+            cache_key = f"search:{hashlib.md5(raw_key.encode('utf-8')).hexdigest()}"
+
+            result = await async_rcache().get(cache_key)
+            if result:
+                logger.info(f"Кэш найден по ключу: {cache_key}")
+            else:
+                index = get_meilisearch_index()
+                logger.debug(f"Выполняется поиск: query='{query}', limit={limit}, offset={offset}")
+
+                result: dict[str, Any] = await sync_to_async(index.search, thread_sensitive=False)(
+                    query, {"offset": offset, "limit": limit}
+                )
+
+                await async_wcache().set(cache_key, result, timeout=jittered_timeout(60*5))
+                logger.info(f"Результат закэширован с ключом: {cache_key}")
+
+            hits = result.get("hits", [])
+            page = paginator.paginate_queryset(hits, request, view=self)
+            if page is None:
+                logger.warning("Paginator вернул None — вероятно, ошибка в параметрах")
+                return Response(
+                    {"error": "Pagination failed"},
+                    status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                )
+
+            response = paginator.get_paginated_response(page)
+            response.data["total_hits"] = result.get("estimatedTotalHits", 0)
+            return response
+
+        except MeilisearchApiError as e:
+            logger.exception("Ошибка Meilisearch API при поиске")
+            return Response(
+                {"error": f"Meilisearch API error: {str(e)}"},
+                status=status.HTTP_502_BAD_GATEWAY,
+            )
+
+        except MeilisearchCommunicationError:
+            logger.exception("Ошибка связи с Meilisearch")
+            return Response(
+                {"error": "Cannot connect to Meilisearch"},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            )
+
+        except Exception:
+            logger.exception("Непредвиденная ошибка при поиске")
+            return Response(
+                {"error": "Internal server error"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+
+class AsyncRandomNote(APIView):
+    """
+    Асинхронный RandomNote (параметры те же, см. RandomNote).
+    """
+
+    async def get(self, request: Request, *args, **kwargs) -> Response:
+        now = timezone.now()
+
+        if _is_authenticated(request.user):
+            queryset = Note.objects.filter(dead_line__gt=now)
+        else:
+            queryset = Note.objects.filter(dead_line__gt=now, only_authorized=False)
+
+        if not self._is_comment_allowed(request):
+            queryset = queryset.filter(to_comment=None)
+
+        # Свежесть не важна — читаем с реплики
+        with stale_reads():
+            random_note = await queryset.order_by('?').afirst()
+
+        if not random_note:
+            return Response(
+                {"detail": "Не найдено ни одной заметки, соответствующей заданным критериям."},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        return Response(await serialize_note(random_note), status=status.HTTP_200_OK)
+
+    def _is_comment_allowed(self, request):
+        """Проверяет, разрешено ли включать комментарии в результаты выборки."""
+        is_comment = request.query_params.get("is-comment", "").strip().lower()
+        return is_comment in ['1', 'true']
+
+
+class AsyncCommentList(APIView):
+    """
+    Асинхронный CommentList: количество и страница комментариев запрашиваются одновременно,
+    комментарии страницы читаются из кэша одним MGET, промахи скачиваются из MinIO параллельно.
+    """
+    pagination_class = CommentPagination
+    permission_classes = [IsAuthenticatedOrReadOnly]
+
+    async def get(self, request: Request, pk: str) -> Response:
+        now = timezone.now()
+
+        if _is_authenticated(request.user):
+            queryset = Note.objects.filter(to_comment_id=pk, dead_line__gt=now)
+        else:
+            queryset = Note.objects.filter(to_comment_id=pk, dead_line__gt=now, only_authorized=False)
+
+        if self._is_count_only_requested(request):
+            exists, count = await asyncio.gather(
+                Note.objects.filter(note_id=pk).aexists(),
+                queryset.acount(),
+            )
+            if not exists:
+                raise exceptions.NotFound("No Note matches the given query.")
+            return Response({'count': count}, status=status.HTTP_200_OK)
+
+        paginator = self.pagination_class()
+        page_size = paginator.get_page_size(request)
+        try:
+            page_number = int(request.query_params.get(paginator.page_query_param, 1))
+        except ValueError:
+            raise exceptions.NotFound("Invalid page.")
+        if page_number < 1:
+            raise exceptions.NotFound("Invalid page.")
+
+        offset = (page_number - 1) * page_size
+        exists, count, notes = await asyncio.gather(
+            Note.objects.filter(note_id=pk).aexists(),
+            queryset.acount(),
+            self._fetch(queryset[offset:offset + page_size]),
+        )
+        if not exists:
+            raise exceptions.NotFound("No Note matches the given query.")
+        if page_number > 1 and offset >= count:
+            raise exceptions.NotFound("Invalid page.")
+
+        results = await acached_notes_data(notes, serialize_note)
+
+        url = request.build_absolute_uri()
+        has_next = offset + page_size < count
+        if page_number <= 1:
+            previous_url = None
+        elif page_number == 2:
+            previous_url = remove_query_param(url, paginator.page_query_param)
+        else:
+            previous_url = replace_query_param(url, paginator.page_query_param, page_number - 1)
+
+        return Response({
+            "count": count,
+            "next": replace_query_param(url, paginator.page_query_param, page_number + 1) if has_next else None,
+            "previous": previous_url,
+            "results": results,
+        })
+
+    @staticmethod
+    async def _fetch(queryset) -> list[Note]:
+        return [note async for note in queryset]
+
+    def _is_count_only_requested(self, request):
+        """Проверяет, нужно ли вернуть только количество комментариев."""
+        value = request.query_params.get('count-comments', '').strip().lower()
+        return value in ['1', 'true']
@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core.checks import Error, register
+
+from util.note_codec import zstd_dict
+
+
+@register("note_codec")
+def check_note_codec(app_configs, **kwargs):
+    """
+    Словарь zstd для записи должен загружаться из MinIO до старта воркеров:
+    иначе сохранение заметок падало бы уже под нагрузкой.
+    """
+    if settings.NOTE_STORAGE_CODEC != "zstd" or not settings.NOTE_ZSTD_DICT_ID:
+        return []
+    try:
+        zstd_dict(settings.NOTE_ZSTD_DICT_ID)
+    except Exception as e:
+        return [Error(
+            f"Словарь zstd NOTE_ZSTD_DICT_ID={settings.NOTE_ZSTD_DICT_ID} не загружается: {e}",
+            hint="Обучите и сохраните словарь командой manage.py train_note_dict.",
+            id="app.E001",
+        )]
+    return []
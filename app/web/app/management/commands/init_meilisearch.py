@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from util.meilisearch import ensure_meilisearch_index
+
+
+class Command(BaseCommand):
+    help = "Создаёт и настраивает индекс Meilisearch (выполняется один раз при развёртывании)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--index",
+            dest="index_name",
+            default=None,
+            help="Имя индекса (по умолчанию MEILISEARCH_INDEX_NAME)",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            updated = ensure_meilisearch_index(options["index_name"])
+        except Exception as e:
+            raise CommandError(f"Не удалось подготовить индекс Meilisearch: {e}")
+
+        if updated:
+            self.stdout.write(self.style.SUCCESS("Индекс Meilisearch создан/обновлён."))
+        else:
+            self.stdout.write(self.style.SUCCESS("Индекс Meilisearch уже настроен."))
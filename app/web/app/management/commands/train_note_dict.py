@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from app.models import Note
+from util.note_codec import store_zstd_dict, train_zstd_dict, zstd_dict_key
+
+
+class Command(BaseCommand):
+    help = "Обучает словарь zstd для сжатия коротких заметок на выборке из MinIO и сохраняет его в MinIO"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--samples", type=int, default=5000, help="Сколько заметок взять в выборку")
+        parser.add_argument("--size", type=int, default=110 * 1024, help="Размер словаря в байтах")
+
+    def handle(self, *args, **options):
+        notes = Note.objects.filter(is_burned=False).order_by("?")[:options["samples"]]
+        samples = [
+            body for body in (note.get_content_text.encode("utf-8") for note in notes)
+            if 0 < len(body) <= settings.NOTE_ZSTD_DICT_MAX_SIZE
+        ]
+        if len(samples) < 10:
+            raise CommandError(f"Слишком мало заметок для обучения словаря: {len(samples)}")
+
+        try:
+            dict_content = train_zstd_dict(samples, options["size"])
+        except Exception as e:
+            raise CommandError(f"Не удалось обучить словарь: {e}")
+
+        dict_id = store_zstd_dict(dict_content)
+        self.stdout.write(self.style.SUCCESS(
+            f"Словарь {dict_id} ({len(dict_content)} байт) обучен на {len(samples)} заметках "
+            f"и сохранён в MinIO ({zstd_dict_key(dict_id)}). "
+            f"Укажите NOTE_ZSTD_DICT_ID={dict_id}; прежние словари остаются в MinIO для чтения."
+        ))
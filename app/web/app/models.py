@@ -1,10 +1,12 @@
 from django.contrib.auth.models import AbstractUser, BaseUserManager
-from django.db import models
+from django.db import models, transaction
 from django.utils.translation import gettext as _
 from datetime import datetime
 from django.utils import timezone
 from django.core.files.base import ContentFile
-from storages.backends.s3boto3 import S3Boto3Storage
+from util.content_store import lock_note_contents, note_content_key
+from util.minio_client import read_note_body
+from util.note_codec import NoteStorage
 import logging
 
 INFINITY = timezone.make_aware(datetime(9999, 12, 31))
@@ -61,7 +63,9 @@ class NoteManager(BaseUserManager):
         
         is_burned = False
         
-        content = ContentFile(content.encode("utf-8"), name=f"{id}.txt")
+        data = content.encode("utf-8")
+        key = note_content_key(data)
+        content = ContentFile(data, name=key)
         
         note = self.model(note_id=id,user=user, 
                           content=content,
@@ -69,14 +73,18 @@ class NoteManager(BaseUserManager):
                           to_comment=to_comment, burn_after_read=burn_after_read, is_burned=is_burned,
                           is_public=is_public)
         
-        note.save(using=self._db)
+        # Одинаковый текст хранится одним объектом: блокировка ключа не даёт
+        # сборке мусора удалить его до вставки этой заметки
+        with transaction.atomic(using="default"):
+            lock_note_contents([key])
+            note.save(using=self._db)
         return note
 
 class Note(models.Model):
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='note')
     note_id = models.CharField(primary_key=True)
     created_at = models.DateTimeField(auto_now_add=True)
-    content = models.FileField(upload_to='', storage=S3Boto3Storage())
+    content = models.FileField(upload_to='', storage=NoteStorage())
     dead_line = models.DateTimeField(default=INFINITY)
     only_authorized = models.BooleanField(default=False)
     # False Всем True только авторизованным
@@ -87,16 +95,20 @@ class Note(models.Model):
     
     objects = NoteManager()
 
+    # Текст заметки, уже известный без чтения из MinIO (например, только что загруженный пачкой)
+    preloaded_content: str | None = None
+
     def __str__(self):
         return self.note_id     # Возвращает индефикатор заметки при выводе
     
     @property
     def get_content_text(self) -> str:
+        if self.preloaded_content is not None:
+            return self.preloaded_content
         try:
             if not self.content:
                 return ""
-            with self.content.open('r') as f:
-                return f.read()  # уже str
+            return read_note_body(self.content.name).decode("utf-8")
         except Exception as e:
             logger.debug(f"[read error] {e}")
             return ''
@@ -105,6 +117,7 @@ class Note(models.Model):
     
     class Meta:
         ordering = ['-created_at']  # Сортировка по дате создания (новые заметки первыми)
+        indexes = [models.Index(fields=['content'], name='note_content_idx')]  # Ссылки на общий текст
         verbose_name = 'Заметка'     # Человекочитаемое имя модели в единственном числе
         verbose_name_plural = 'Заметки'  # Человекочитаемое имя модели во множественном числе
         db_table = 'note'            # Имя таблицы в базе данных
\ No newline at end of file
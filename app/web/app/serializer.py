@@ -1,3 +1,4 @@
+from django.conf import settings
 from rest_framework import serializers
 from django.contrib.auth import authenticate
 
@@ -5,6 +6,9 @@ from .models import Note, CustomUser
 from .models import INFINITY
 
 from django.core.files.base import ContentFile
+from django.db import transaction
+
+from util.content_store import lock_note_contents, note_content_key
 
 # Сериализатор заметок
 class NoteSerializer(serializers.ModelSerializer):
@@ -47,9 +51,13 @@ class NoteSerializer(serializers.ModelSerializer):
 
     def update(self, instance, validated_data):
         content = validated_data.get("content")
+        released_key = None
         if content is not None:
-            filename = f"{instance.note_id}.txt"
-            instance.content = ContentFile(content.encode("utf-8"), name=filename)
+            data = content.encode("utf-8")
+            key = note_content_key(data)
+            if key != instance.content.name:
+                released_key = instance.content.name
+                instance.content = ContentFile(data, name=key)
 
         instance.dead_line = validated_data.get("dead_line", instance.dead_line)
         instance.only_authorized = validated_data.get("only_authorized", instance.only_authorized)
@@ -57,17 +65,46 @@ class NoteSerializer(serializers.ModelSerializer):
         instance.burn_after_read = validated_data.get("burn_after_read", instance.burn_after_read)
         instance.is_public = validated_data.get("is_public", instance.is_public)
 
-        instance.save()
+        with transaction.atomic(using="default"):
+            if released_key is not None:
+                lock_note_contents([instance.content.name])
+            instance.save()
+
+        if released_key:
+            # Прежний текст мог остаться без ссылок
+            from tasks.base_tasks import release_note_contents
+            transaction.on_commit(lambda: release_note_contents.delay([released_key]), using="default")
         return instance
 
     def to_representation(self, instance):
-        """Возвращаем content как строку, через метод модели"""
+        """Возвращаем content как строку, через метод модели (без него, если include_content=False в контексте)"""
         rep = super().to_representation(instance)
-        rep["content"] = instance.get_content_text
+        if self.context.get("include_content", True):
+            rep["content"] = instance.get_content_text
         return rep
 
 
 
+# Метаданные заметки, текст которой клиент загрузит напрямую в MinIO
+class NoteUploadSerializer(NoteSerializer):
+    content = None
+    size = serializers.IntegerField(write_only=True, min_value=1, max_value=settings.NOTE_UPLOAD_MAX_SIZE)
+
+    class Meta(NoteSerializer.Meta):
+        fields = None
+        exclude = ["content"]
+
+
+# Завершение загрузки: ETag каждой загруженной части
+class UploadPartSerializer(serializers.Serializer):
+    part_number = serializers.IntegerField(min_value=1, max_value=10000)
+    etag = serializers.CharField()
+
+
+class NoteUploadCompleteSerializer(serializers.Serializer):
+    parts = UploadPartSerializer(many=True, allow_empty=False)
+
+
 # Регистрация пользователя
 class RegisterSerializer(serializers.ModelSerializer):
     class Meta:
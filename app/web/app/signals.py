@@ -1,18 +1,41 @@
+from django.db import transaction
 from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from .models import Note
 import logging
 from util.meilisearch import get_meilisearch_index
+from util.cache import bump_note_list_version, forget_missing_note
 from tasks.base_tasks import delete_note_data, update_note_data_if_changed, update_meilisearch_document_if_public
 from .serializer import NoteSerializer
 
 logger = logging.getLogger("myapp")
 
+# Приоритет задач удаления (см. CELERY_BROKER_TRANSPORT_OPTIONS, 0 — наивысший)
+URGENT_TASK_PRIORITY = 0
+
 @receiver(post_delete, sender=Note)
 def delete_file_on_model_delete(sender, instance, **kwargs):
     if instance.content:
         logger.debug(f"The note content was removed from the object storage {instance.note_id}")
-        delete_note_data.delay(instance.note_id)
+        # После коммита: сборка мусора в MinIO должна уже не видеть удалённую строку
+        transaction.on_commit(
+            lambda: delete_note_data.apply_async(
+                (instance.note_id, instance.content.name), priority=URGENT_TASK_PRIORITY
+            ),
+            using="default",
+        )
+
+@receiver(post_delete, sender=Note)
+@receiver(post_save, sender=Note)
+def invalidate_note_list_cache(sender, instance, **kwargs):
+    # Любое изменение заметки делает закэшированные списки владельца устаревшими
+    bump_note_list_version(instance.user_id)
+
+@receiver(post_save, sender=Note)
+def clear_missing_note_mark(sender, instance, **kwargs):
+    # ID мог быть ранее запрошен и закэширован как отсутствующий. После коммита:
+    # иначе запрос между снятием отметки и коммитом снова отметил бы заметку отсутствующей
+    transaction.on_commit(lambda: forget_missing_note(instance.note_id), using="default")
 
 @receiver(post_save, sender=Note)
 def loading_content_into_a_search_engine(sender, instance, created, **kwargs):
@@ -24,4 +47,10 @@ def loading_content_into_a_search_engine(sender, instance, created, **kwargs):
             
     else:
         serializer = NoteSerializer(instance)
-        update_note_data_if_changed.delay(instance.note_id, serializer.data)
+        if instance.is_burned:
+            # Сожжённая заметка должна исчезнуть из кэша и поиска как можно скорее
+            update_note_data_if_changed.apply_async(
+                (instance.note_id, serializer.data), queue="deletion", priority=URGENT_TASK_PRIORITY
+            )
+        else:
+            update_note_data_if_changed.delay(instance.note_id, serializer.data)
@@ -1,19 +1,36 @@
-from rest_framework.test import APIClient, APITestCase
+from asgiref.sync import async_to_sync
+from rest_framework.test import APIClient, APIRequestFactory, APITestCase, APITransactionTestCase, force_authenticate
 from rest_framework.reverse import reverse
 from rest_framework import status
 from django.contrib.auth import get_user_model
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
 from django.utils import timezone
 from datetime import timedelta
+import gzip
+import time
+from unittest.mock import MagicMock, patch
 from .models import Note
 from django.apps import apps
 
 import meilisearch
+import pyzstd
 
 from .models import Note
 from util.meilisearch import (
     create_meilisearch_client,
     get_meilisearch_index,
 )
+from util.cache import deleted_owners, get_account_deletion_progress, mark_account_deleted
+from tasks.base_tasks import purge_account, release_note_contents
+from config.auth_backend import CachedModelBackend
+from config import settings as project_settings
+from config.db_router import MasterReplicaRouter, ReplicaPool, stale_reads
+from config.middleware import ReadYourWritesMiddleware
+from util.cache_shard import ShardedClient, ShardRing, ShardRoutingError, shard_names
+from .async_views import AsyncNoteDetail
+from .views import NoteAPI, NoteContent
+from util.note_codec import GZIP, ZSTD, iter_decode_note_body
 
 
 User = get_user_model()
@@ -153,6 +170,16 @@ class AccountTest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.json()['username'], partial_data['username'])
     
+    def test_update_account_refreshes_cached_user(self):
+        """Проверяет, что после изменения аккаунта сессия получает свежего пользователя, а не кэшированного."""
+        backend = CachedModelBackend()
+        backend.get_user(self.default_user.pk)  # прогреваем кэш
+        self.client.force_login(self.default_user)
+
+        self.client.patch(reverse('update_account'), {'username': 'renamed_user'}, format='json')
+
+        self.assertEqual(backend.get_user(self.default_user.pk).username, 'renamed_user')
+
     def test_delete_account_removes_user(self):
         """Проверяет удаление аккаунта пользователя."""
         user_to_delete = User.objects.create_user(
@@ -162,8 +189,64 @@ class AccountTest(APITestCase):
         
         response = self.client.delete(reverse('delete_account'))
         
-        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
-        self.assertFalse(User.objects.filter(username='delete_me').exists())
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertFalse(User.objects.get(username='delete_me').is_active)
+        self.assertIn('job_id', response.data)
+
+    def test_delete_account_hides_notes_immediately(self):
+        """Проверяет, что заметки удаляемого аккаунта перестают отдаваться до фонового удаления."""
+        user_to_delete = User.objects.create_user(username='delete_me', password='delete_pass')
+        note = Note.objects.create_note(user=user_to_delete, content='to hide', only_authorized=False)
+        self.client.get(reverse('notes-detail', args=[note.note_id]))  # прогреваем кэш
+        self.client.force_login(user_to_delete)
+
+        with patch('app.views.purge_account.delay') as purge, self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(reverse('delete_account'))
+
+        purge.assert_called_once()
+        self.assertEqual(deleted_owners([user_to_delete.pk]), {user_to_delete.pk})
+        response = self.client.get(reverse('notes-detail', args=[note.note_id]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_purge_account_removes_notes_and_user(self):
+        """Проверяет, что фоновое удаление убирает заметки, комментарии к ним и самого пользователя."""
+        user_to_delete = User.objects.create_user(username='purge_me', password='purge_pass')
+        note = Note.objects.create_note(user=user_to_delete, content='to purge', only_authorized=False)
+        comment = Note.objects.create_note(
+            user=self.default_user, content='comment', only_authorized=False, to_comment=note
+        )
+
+        mark_account_deleted(user_to_delete.pk)
+
+        purge_account.apply(args=(user_to_delete.pk, 'test-job'))
+
+        self.assertFalse(User.objects.filter(pk=user_to_delete.pk).exists())
+        self.assertEqual(deleted_owners([user_to_delete.pk]), set())
+        self.assertFalse(Note.objects.filter(note_id__in=[note.note_id, comment.note_id]).exists())
+        self.assertEqual(get_account_deletion_progress('test-job')['status'], 'done')
+
+    def test_purge_account_survives_search_outage(self):
+        """Проверяет, что недоступный Meilisearch не мешает удалению, а документы дочищаются в фоне."""
+        user_to_delete = User.objects.create_user(username='purge_me', password='purge_pass')
+        note = Note.objects.create_note(user=user_to_delete, content='to purge', only_authorized=False)
+
+        with patch('tasks.base_tasks.delete_many_from_meilisearch', side_effect=RuntimeError('down')), \
+                patch('tasks.base_tasks.delete_search_documents.delay') as retry_delete:
+            purge_account.apply(args=(user_to_delete.pk, 'search-job'))
+
+        self.assertFalse(Note.objects.filter(note_id=note.note_id).exists())
+        retry_delete.assert_called_once_with([note.note_id])
+        self.assertEqual(get_account_deletion_progress('search-job')['status'], 'done')
+
+    def test_purge_account_reports_failure(self):
+        """Проверяет, что после исчерпания повторов прогресс удаления становится failed."""
+        user_to_delete = User.objects.create_user(username='purge_me', password='purge_pass')
+        Note.objects.create_note(user=user_to_delete, content='to purge', only_authorized=False)
+
+        with patch('tasks.base_tasks.purge_note_chunk', side_effect=RuntimeError('db down')):
+            purge_account.apply(args=(user_to_delete.pk, 'failed-job'), retries=purge_account.max_retries)
+
+        self.assertEqual(get_account_deletion_progress('failed-job')['status'], 'failed')
 
 class NoteTest(APITestCase):
     def setUp(self):
@@ -230,6 +313,146 @@ class NoteTest(APITestCase):
         self.assertEqual(len(response.data), 2)  # note_active_other — public
         self.assertEqual(response.data[0]['note_id'], self.note_active_other.note_id)
 
+    def test_list_cache_invalidated_after_new_note(self):
+        self.client.force_authenticate(user=self.user)
+        url = reverse('notes-list')
+        self.client.get(url)  # прогреваем кэш списка
+
+        new_note = Note.objects.create_note(
+            user=self.user,
+            content="New mine",
+            dead_line=timezone.now() + timedelta(days=1),
+            only_authorized=False
+        )
+        response = self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 2)
+        self.assertEqual(response.data[0]['note_id'], new_note.note_id)
+
+    # --- Тесты для bulk ---
+
+    def test_bulk_create_notes(self):
+        self.client.force_authenticate(user=self.user)
+        url = reverse('notes-bulk')
+        payload = [{"content": "Bulk one"}, {"content": "Bulk two", "is_public": True}]
+        response = self.client.post(url, payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([note['content'] for note in response.data], ["Bulk one", "Bulk two"])
+        created = Note.objects.get(note_id=response.data[1]['note_id'])
+        self.assertEqual(created.get_content_text, "Bulk two")
+
+    def test_bulk_create_reuploads_text_collected_before_lock(self):
+        """Проверяет, что текст, удалённый сборкой мусора между загрузкой и блокировкой, загружается заново."""
+        from app import views
+        from tasks.base_tasks import delete_many_from_minio
+
+        real_lock = views.lock_note_contents
+
+        def collect_then_lock(keys):
+            delete_many_from_minio(list(keys))  # сборка мусора успела раньше блокировки
+            real_lock(keys)
+
+        self.client.force_authenticate(user=self.user)
+        with patch('app.views.lock_note_contents', side_effect=collect_then_lock):
+            response = self.client.post(reverse('notes-bulk'), [{"content": "Collected early"}], format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        created = Note.objects.get(note_id=response.data[0]['note_id'])
+        self.assertEqual(created.get_content_text, "Collected early")
+
+    def test_batch_returns_notes_and_errors(self):
+        url = reverse('notes-batch')
+        ids = [self.note_active_other.note_id, self.note_only_auth.note_id, 'nonexistent']
+        response = self.client.get(url, {'ids': ','.join(ids)})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([note['note_id'] for note in response.data['results']], [self.note_active_other.note_id])
+        self.assertEqual(response.data['errors'][self.note_only_auth.note_id]['status'], status.HTTP_403_FORBIDDEN)
+        self.assertEqual(response.data['errors']['nonexistent']['status'], status.HTTP_404_NOT_FOUND)
+
+    def test_batch_storage_error_neither_burns_nor_caches(self):
+        """Проверяет, что заметки, чей текст не прочитался из MinIO, попадают в errors и не сгорают."""
+        burn = Note.objects.create_note(
+            user=self.other_user, content='Burn me', only_authorized=False, burn_after_read=True
+        )
+        ids = [burn.note_id, self.note_active_other.note_id]
+
+        with patch('app.views.read_note_body', side_effect=RuntimeError('minio down')):
+            response = self.client.get(reverse('notes-batch'), {'ids': ','.join(ids)})
+
+        self.assertEqual(response.data['results'], [])
+        for note_id in ids:
+            self.assertEqual(response.data['errors'][note_id]['status'], status.HTTP_500_INTERNAL_SERVER_ERROR)
+        self.assertFalse(Note.objects.get(note_id=burn.note_id).is_burned)
+
+        response = self.client.get(reverse('notes-batch'), {'ids': self.note_active_other.note_id})
+        self.assertEqual(response.data['results'][0]['content'], 'Active other')
+
+    def test_content_stream_honours_range(self):
+        url = reverse('notes-content', args=[self.note_active_other.note_id])
+        response = self.client.get(url, HTTP_RANGE='bytes=0-5')
+
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(b''.join(response.streaming_content), b'Active')
+        self.assertTrue(response['Content-Range'].startswith('bytes 0-5/'))
+
+    def test_same_content_stored_once(self):
+        copy = Note.objects.create_note(user=self.other_user, content="Active mine", only_authorized=False)
+        self.assertEqual(copy.content.name, self.note_active_mine.content.name)
+
+        copy.delete()
+        self.assertEqual(release_note_contents([copy.content.name]), 0)
+        self.assertEqual(Note.objects.get(note_id=self.note_active_mine.note_id).get_content_text, "Active mine")
+
+    @override_settings(NOTE_STORAGE_CODEC="gzip")
+    def test_compressed_note_read_back(self):
+        text = "Compressed note " * 50
+        note = Note.objects.create_note(user=self.user, content=text, only_authorized=False)
+
+        self.assertEqual(Note.objects.get(note_id=note.note_id).get_content_text, text)
+        response = self.client.get(reverse('notes-content', args=[note.note_id]), HTTP_RANGE='bytes=0-9')
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(b''.join(response.streaming_content), b'Compressed')
+        self.assertEqual(response['Content-Range'], f'bytes 0-9/{len(text)}')
+
+    def test_upload_can_be_aborted(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.post(reverse('notes-upload'), {"size": 10}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data['parts']), 1)
+        note_id = response.data['note_id']
+
+        response = self.client.delete(reverse('notes-upload-detail', args=[note_id]))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+        response = self.client.post(reverse('notes-upload-complete', args=[note_id]), {"parts": []}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_upload_complete_rejects_deleted_parent(self):
+        """Проверяет, что удалённый за время загрузки родитель комментария даёт 400, а не 500."""
+        parent = Note.objects.create_note(user=self.user, content='Parent', only_authorized=False)
+        self.client.force_authenticate(user=self.user)
+        response = self.client.post(
+            reverse('notes-upload'), {"size": 10, "to_comment": parent.note_id}, format='json'
+        )
+        note_id = response.data['note_id']
+        parent.delete()
+
+        with patch('app.views.complete_note_upload', return_value=10), \
+                patch('app.views.delete_from_minio') as release:
+            response = self.client.post(
+                reverse('notes-upload-complete', args=[note_id]), {"parts": [{"part_number": 1, "etag": "x"}]},
+                format='json',
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('to_comment', response.data)
+        release.assert_called_once_with(note_id)
+        self.assertFalse(Note.objects.filter(note_id=note_id).exists())
+
     # --- Тесты для retrieve ---
 
     def test_retrieve_note_success(self):
@@ -240,6 +463,16 @@ class NoteTest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data['note_id'], self.note_active_mine.note_id)
 
+    def test_retrieve_revalidates_with_etag(self):
+        url = reverse('notes-detail', args=[self.note_active_other.note_id])
+        response = self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('no-cache', response['Cache-Control'])
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+
     def test_retrieve_nonexistent_note_returns_404(self):
         self.client.force_authenticate(user=self.user)
         url = reverse('notes-detail', args=['nonexistent'])
@@ -434,3 +667,312 @@ class CommentTest(APITestCase):
 #         self.assertEqual(len(response.data["results"]), 0)
 
 
+class AsyncNoteDetailTest(APITransactionTestCase):
+    """
+    Сверяет AsyncNoteDetail (ASYNC_VIEWS) с синхронным NoteAPI.retrieve.
+
+    Транзакционный тест: тело заметки async-представление сериализует в
+    отдельном потоке со своим соединением, которое не видит незакоммиченных строк.
+    """
+
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        self.user = User.objects.create_user(username='async_user', password='password123')
+        self.views = {
+            'sync': NoteAPI.as_view({'get': 'retrieve'}),
+            'async': async_to_sync(AsyncNoteDetail.as_view()),
+        }
+
+    def retrieve(self, view: str, pk: str):
+        request = self.factory.get(f'/notes/{pk}/')
+        force_authenticate(request, user=self.user)
+        return self.views[view](request, pk=pk)
+
+    def test_retrieve_matches_sync_view(self):
+        """Проверяет, что async-представление отдаёт те же поля и текст, что и синхронное."""
+        responses = {}
+        for view in self.views:
+            note = Note.objects.create_note(user=self.user, content='Async parity', only_authorized=True)
+            responses[view] = self.retrieve(view, note.note_id)
+
+        for view, response in responses.items():
+            with self.subTest(view=view):
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertEqual(response.data['content'], 'Async parity')
+        self.assertEqual(set(responses['sync'].data), set(responses['async'].data))
+
+    def test_burn_after_read_matches_sync_view(self):
+        """Проверяет, что заметка burn_after_read отдаётся один раз в обоих представлениях."""
+        for view in self.views:
+            with self.subTest(view=view):
+                note = Note.objects.create_note(
+                    user=self.user, content='Burn me', only_authorized=False, burn_after_read=True
+                )
+
+                first = self.retrieve(view, note.note_id)
+                second = self.retrieve(view, note.note_id)
+
+                self.assertEqual(first.status_code, status.HTTP_200_OK)
+                self.assertEqual(first.data['content'], 'Burn me')
+                self.assertEqual(second.status_code, status.HTTP_404_NOT_FOUND)
+                self.assertTrue(Note.objects.get(note_id=note.note_id).is_burned)
+
+    def test_burn_after_read_survives_storage_error(self):
+        """Проверяет, что при ошибке MinIO заметка burn_after_read не сгорает ни в одном представлении."""
+        for view in self.views:
+            with self.subTest(view=view):
+                note = Note.objects.create_note(
+                    user=self.user, content='Keep me', only_authorized=False, burn_after_read=True
+                )
+
+                with patch('app.views.read_note_body', side_effect=RuntimeError('minio down')):
+                    response = self.retrieve(view, note.note_id)
+
+                self.assertEqual(response.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR)
+                self.assertFalse(Note.objects.get(note_id=note.note_id).is_burned)
+
+    def test_missing_and_expired_notes_match_sync_view(self):
+        """Проверяет 404 для несуществующей и истёкшей заметки в обоих представлениях."""
+        for view in self.views:
+            with self.subTest(view=view):
+                expired = Note.objects.create_note(
+                    user=self.user, content='Expired', only_authorized=False,
+                    dead_line=timezone.now() - timedelta(days=1),
+                )
+
+                self.assertEqual(self.retrieve(view, f'missing-{view}').status_code, status.HTTP_404_NOT_FOUND)
+                self.assertEqual(self.retrieve(view, expired.note_id).status_code, status.HTTP_404_NOT_FOUND)
+
+
+@patch('config.db_router.sys.argv', ['manage.py', 'runserver'])  # в тестах роутер всегда читает с default
+class ReadYourWritesTest(SimpleTestCase):
+    """Тесты закрепления чтений за мастером (ReadYourWritesMiddleware + MasterReplicaRouter)."""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.router = MasterReplicaRouter()
+        self.router.replicas = ReplicaPool({'replica': 1}, max_lag=10, check_interval=3600)
+        self.router.replicas.checked_at = time.monotonic()  # без фоновой проверки
+        self.reads = []
+
+    def run_request(self, cookies=None, write=False):
+        def view(request):
+            if write:
+                self.router.db_for_write(Note)
+            self.reads.append(self.router.db_for_read(Note))
+            with stale_reads():
+                self.reads.append(self.router.db_for_read(Note))
+            return HttpResponse()
+
+        request = self.factory.get('/')
+        request.COOKIES.update(cookies or {})
+        return ReadYourWritesMiddleware(view)(request)
+
+    def test_reads_go_to_replica_without_pin(self):
+        response = self.run_request()
+
+        self.assertEqual(self.reads, ['replica', 'replica'])
+        self.assertNotIn('db_pin', response.cookies)
+
+    def test_write_pins_following_reads_to_master(self):
+        response = self.run_request(write=True)
+
+        self.assertEqual(self.reads[0], 'default')
+        self.assertIn('db_pin', response.cookies)
+
+        self.reads.clear()
+        self.run_request(cookies={'db_pin': response.cookies['db_pin'].value})
+        self.assertEqual(self.reads, ['default', 'replica'])  # stale_reads всё равно идут на реплику
+
+    def test_expired_or_forged_pin_is_ignored(self):
+        for value in (f'{time.time() - 1:.3f}', f'{time.time() + 3600:.3f}', 'garbage'):
+            with self.subTest(value=value):
+                self.reads.clear()
+                self.run_request(cookies={'db_pin': value})
+                self.assertEqual(self.reads[0], 'replica')
+
+
+class ReplicaPoolTest(SimpleTestCase):
+    """Тесты выбора реплик по весам и состоянию проверки отставания."""
+
+    def test_unhealthy_and_zero_weight_replicas_are_skipped(self):
+        pool = ReplicaPool({'replica': 1, 'replica_1': 3, 'replica_2': 0}, max_lag=10, check_interval=3600)
+        with patch.object(pool, '_probe', side_effect=lambda alias: alias == 'replica_1'):
+            pool.refresh()
+
+        self.assertEqual({pool.choose() for _ in range(50)}, {'replica_1'})
+
+    def test_no_healthy_replicas(self):
+        pool = ReplicaPool({'replica': 1}, max_lag=10, check_interval=3600)
+        with patch.object(pool, '_probe', return_value=False):
+            pool.refresh()
+
+        self.assertIsNone(pool.choose())
+
+    def test_stale_state_is_probed_in_background(self):
+        """Проверяет, что запрос не ждёт медленную проверку реплики."""
+        pool = ReplicaPool({'replica': 1}, max_lag=10, check_interval=3600)
+
+        def slow_probe(alias):
+            time.sleep(1)
+            return False
+
+        with patch.object(pool, '_probe', side_effect=slow_probe):
+            started = time.monotonic()
+            self.assertEqual(pool.choose(), 'replica')  # последнее известное состояние
+            self.assertLess(time.monotonic() - started, 0.5)
+
+            with pool._lock:  # дожидаемся фоновой проверки
+                pass
+
+        self.assertIsNone(pool.choose())
+
+    def test_lag_above_threshold_marks_replica_unhealthy(self):
+        pool = ReplicaPool({'replica': 1}, max_lag=10, check_interval=3600)
+        with patch('config.db_router.connections') as connections:
+            cursor = connections.__getitem__.return_value.cursor.return_value.__enter__.return_value
+            cursor.fetchone.return_value = (30.0,)
+            self.assertFalse(pool._probe('replica'))
+            cursor.fetchone.return_value = (1.0,)
+            self.assertTrue(pool._probe('replica'))
+
+
+class DatabaseConfigTest(SimpleTestCase):
+    """Тесты настроек соединений с PostgreSQL (постоянные соединения и pgbouncer)."""
+
+    @patch.dict('os.environ', {}, clear=True)
+    def test_persistent_mode(self):
+        with patch.object(project_settings, 'DB_USE_PGBOUNCER', False), \
+                patch.object(project_settings, 'GEVENT_WORKERS', False), \
+                patch.object(project_settings, 'ASGI_WORKERS', False):
+            config = project_settings.database_config('db-host')
+
+        self.assertEqual(config['HOST'], 'db-host')
+        self.assertEqual(config['CONN_MAX_AGE'], 60)
+        self.assertTrue(config['CONN_HEALTH_CHECKS'])
+        self.assertFalse(config['DISABLE_SERVER_SIDE_CURSORS'])
+        self.assertNotIn('prepare_threshold', config['OPTIONS'])
+
+    @patch.dict('os.environ', {}, clear=True)
+    def test_pgbouncer_mode(self):
+        with patch.object(project_settings, 'DB_USE_PGBOUNCER', True), \
+                patch.object(project_settings, 'GEVENT_WORKERS', True):
+            config = project_settings.database_config('pooler-host')
+
+        self.assertEqual(config['CONN_MAX_AGE'], 0)
+        self.assertTrue(config['DISABLE_SERVER_SIDE_CURSORS'])
+        self.assertIsNone(config['OPTIONS']['prepare_threshold'])
+
+
+class ShardRingTest(SimpleTestCase):
+    """Тесты консистентного хеширования ключей кэша по шардам."""
+
+    keys = [f'note:{i}' for i in range(3000)]
+
+    def test_keys_spread_evenly_and_stably(self):
+        ring = ShardRing(['a', 'b', 'c'])
+        indexes = [ring.index(key) for key in self.keys]
+
+        self.assertEqual(indexes, [ShardRing(['a', 'b', 'c']).index(key) for key in self.keys])
+        for shard in range(3):
+            self.assertGreater(indexes.count(shard), len(self.keys) * 0.2)
+
+    def test_adding_shard_moves_few_keys(self):
+        before, after = ShardRing(['a', 'b', 'c']), ShardRing(['a', 'b', 'c', 'd'])
+
+        moved = [key for key in self.keys if before.index(key) != after.index(key)]
+
+        self.assertLess(len(moved), len(self.keys) * 0.4)
+        self.assertTrue(all(after.index(key) == 3 for key in moved))  # уходят только в новый шард
+
+    def test_shard_names_must_match_servers(self):
+        self.assertEqual(shard_names(['redis://a', 'redis://b'], {}), ['shard-0', 'shard-1'])
+        with self.assertRaises(ValueError):
+            shard_names(['redis://a', 'redis://b'], {'SHARD_NAMES': ['a']})
+
+    def test_shard_without_replica_reads_from_master(self):
+        self.assertEqual(
+            project_settings.cache_shard(' a = redis://m:6379/0 '),
+            ('a', 'redis://m:6379/0', 'redis://m:6379/0'),
+        )
+        with self.assertRaises(project_settings.ImproperlyConfigured):
+            project_settings.cache_shard('redis://m:6379/0')
+
+
+class ShardedClientTest(SimpleTestCase):
+    """Тесты ShardedClient с несколькими шардами (соединения подменены, Redis не нужен)."""
+
+    def setUp(self):
+        from django_redis.cache import RedisCache
+
+        self.shards = [MagicMock(name='shard-a'), MagicMock(name='shard-b')]
+        patcher = patch.object(ShardedClient, 'connect', side_effect=lambda index: self.shards[index])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.cache = RedisCache(
+            ['redis://a:6379/0', 'redis://b:6379/0'],
+            {'OPTIONS': {'CLIENT_CLASS': 'util.cache_shard.ShardedClient', 'SHARD_NAMES': ['a', 'b'],
+                         'CLOSE_CONNECTION': True}},
+        )
+        self.client = self.cache.client
+
+    def keys_by_shard(self):
+        """По ключу в каждом шарде."""
+        found = {}
+        for i in range(100):
+            found.setdefault(self.client._ring.index(str(self.client.make_key(f'k{i}'))), f'k{i}')
+        return found[0], found[1]
+
+    def test_clear_and_close_reach_every_shard(self):
+        self.client.clear()
+        for shard in self.shards:
+            shard.flushdb.assert_called_once()
+
+        with patch.object(self.client.connection_factory, 'disconnect') as disconnect:
+            self.client.close()
+        self.assertEqual([call.args[0] for call in disconnect.call_args_list], self.shards)
+
+    def test_set_commands_go_to_key_shard(self):
+        _, second = self.keys_by_shard()
+
+        self.client.sadd(second, 'member')
+
+        self.shards[1].sadd.assert_called_once()
+        self.shards[0].sadd.assert_not_called()
+
+    def test_cross_shard_and_unrouted_commands_name_the_command(self):
+        first, second = self.keys_by_shard()
+
+        with self.assertRaisesRegex(ShardRoutingError, 'sdiff'):
+            self.client.sdiff(first, second)
+        with self.assertRaisesRegex(ShardRoutingError, 'hlen'):
+            super(ShardedClient, self.client).hlen('hash')
+
+
+class NoteCodecStreamTest(SimpleTestCase):
+    """Тесты потокового разжатия текстов заметок."""
+
+    text = b'note body ' * 50000
+
+    def decode(self, blob: bytes, encoding: str) -> list[bytes]:
+        chunks = (blob[i:i + 1000] for i in range(0, len(blob), 1000))
+        return list(iter_decode_note_body(chunks, encoding, 4096))
+
+    def test_gzip_and_zstd_decode_in_bounded_chunks(self):
+        for encoding, blob in ((GZIP, gzip.compress(self.text)), (ZSTD, pyzstd.compress(self.text))):
+            with self.subTest(encoding=encoding):
+                chunks = self.decode(blob, encoding)
+                self.assertEqual(b''.join(chunks), self.text)
+                self.assertLessEqual(max(map(len, chunks)), 4096)
+
+    def test_slice_stops_at_range_end(self):
+        read = []
+
+        def chunks():
+            for chunk in [b'0123', b'4567', b'89ab', b'cdef']:
+                read.append(chunk)
+                yield chunk
+
+        self.assertEqual(b''.join(NoteContent._slice(chunks(), 3, 9)), b'3456789')
+        self.assertEqual(read, [b'0123', b'4567', b'89ab'])  # после конца диапазона не читаем
@@ -1,12 +1,19 @@
 from rest_framework import routers
+from django.conf import settings
 from django.urls import path, include
 from .views import (
     NoteAPI,
+    BulkNoteCreate,
+    NoteBatch,
+    NoteContent,
+    NoteUpload,
+    NoteUploadComplete,
     RegView,
     LoginView,
     LogoutView,
     UpdateAccountView,
     DeleteAccountView,
+    AccountDeletionStatusView,
     CommentList,
     RandomNote,
     SearchNote
@@ -15,11 +22,32 @@ from .views import (
 router = routers.DefaultRouter()
 router.register(r'notes', NoteAPI, basename='notes')
 
+if settings.ASYNC_VIEWS:
+    # Асинхронные представления чтения (ASGI)
+    from .async_views import AsyncSearchNote, AsyncRandomNote, AsyncCommentList, AsyncNoteDetail
+
+    read_urlpatterns = [
+        path('notes/search/', AsyncSearchNote.as_view(), name="search"),
+        path('notes/random/', AsyncRandomNote.as_view(), name='random-note'),
+        path('notes/<str:pk>/comments/', AsyncCommentList.as_view(), name='get_comments'),
+        path('notes/<str:pk>/', AsyncNoteDetail.as_view(), name='notes-detail-async'),
+    ]
+else:
+    read_urlpatterns = [
+        path('notes/search/', SearchNote.as_view(), name="search"),
+        path('notes/random/', RandomNote.as_view(), name='random-note'),
+        path('notes/<str:pk>/comments/', CommentList.as_view(), name='get_comments'),
+    ]
+
 urlpatterns = [
     # Специфичные пути выше
-    path('notes/search/', SearchNote.as_view(), name="search"),
-    path('notes/random/', RandomNote.as_view(), name='random-note'),
-    path('notes/<str:pk>/comments/', CommentList.as_view(), name='get_comments'),
+    path('notes/bulk/', BulkNoteCreate.as_view(), name='notes-bulk'),
+    path('notes/batch/', NoteBatch.as_view(), name='notes-batch'),
+    path('notes/<str:pk>/content/', NoteContent.as_view(), name='notes-content'),
+    path('notes/uploads/', NoteUpload.as_view(), name='notes-upload'),
+    path('notes/uploads/<str:pk>/', NoteUpload.as_view(), name='notes-upload-detail'),
+    path('notes/uploads/<str:pk>/complete/', NoteUploadComplete.as_view(), name='notes-upload-complete'),
+    *read_urlpatterns,
     
     # Роутер в самом низу
     path('', include(router.urls)),
@@ -30,4 +58,5 @@ urlpatterns = [
     path('logout/', LogoutView.as_view(), name='logout'),
     path('account/update/', UpdateAccountView.as_view(), name='update_account'),
     path('account/delete/', DeleteAccountView.as_view(), name='delete_account'),
+    path('account/delete/<str:job_id>/', AccountDeletionStatusView.as_view(), name='delete_account_status'),
 ]
\ No newline at end of file
@@ -1,31 +1,93 @@
 import hashlib
-import json
+import re
+import uuid
 from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet
-from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly
+from rest_framework.permissions import AllowAny, IsAuthenticated, IsAuthenticatedOrReadOnly
 from rest_framework.response import Response
+from rest_framework.reverse import reverse
 from rest_framework.request import Request
 from django.utils import timezone
 from rest_framework import exceptions, request as drf_request
 from django.shortcuts import get_object_or_404
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.http.response import HttpResponseBase
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import parse_etags
+from botocore.exceptions import ClientError
 from .permissions import IsOwnerOrReadOnly
 from util.meilisearch import get_meilisearch_index
 from meilisearch.errors import MeilisearchApiError, MeilisearchCommunicationError
 import logging
-from typing import Any
-from util.cache import wcache, rcache
+import orjson
+from typing import Any, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models.signals import post_save
+from util.cache import (
+    wcache,
+    rcache,
+    scache,
+    get_note_list_version,
+    note_list_cache_key,
+    note_list_cache_timeout,
+    fetch_single_flight,
+    MISSING,
+    jittered_timeout,
+    missing_note_key,
+    note_cache_key,
+    note_meta_cache_key,
+    note_upload_key,
+    cached_notes_data,
+    NOTE_CACHE_TIMEOUT,
+    NOTE_MISSING_CACHE_TIMEOUT,
+    bump_note_list_version,
+    deleted_owners,
+    mark_account_deleted,
+    forget_missing_notes,
+    forget_cached_user,
+    set_account_deletion_progress,
+    get_account_deletion_progress,
+)
+from tasks.base_tasks import (
+    delete_from_minio,
+    index_note,
+    index_public_notes,
+    purge_account,
+    release_note_contents,
+)
+from util.key import get_key_from_sidecar, get_keys_from_sidecar
+from util.minio_client import (
+    STREAM_CHUNK_SIZE,
+    abort_note_upload,
+    complete_note_upload,
+    create_note_upload,
+    iter_object_body,
+    object_encoding,
+    object_text_size,
+    open_note_object,
+    presigned_note_url,
+    read_note_body,
+    upload_note_contents,
+)
+from util.content_store import content_etag, lock_note_contents, note_content_key
 from util.norm import normalize_string
-from util.check_note import check_note
+from util.note_codec import iter_decode_note_body
+from util.check_note import check_note, check_note_owner
 from django.utils.dateparse import parse_datetime
+from config.db_router import stale_reads
 
 from django.contrib.auth import login, logout
 
 from .pagination import CommentPagination, SearchNotePagination
 
-from .models import Note
+from .models import CustomUser, Note, INFINITY
 from .serializer import (
     NoteSerializer,
+    NoteUploadSerializer,
+    NoteUploadCompleteSerializer,
     RegisterSerializer,
     LoginSerializer,
     UserUpdateSerializer,
@@ -33,6 +95,83 @@ from .serializer import (
 
 logger = logging.getLogger("myapp")
 
+
+def with_content_url(data: dict) -> dict:
+    """
+    Метаданные заметки из note:meta:{id} -> ответ с подписанной ссылкой content_url.
+    Данные с текстом (content) возвращаются как есть.
+    """
+    if "content_key" not in data:
+        return data
+    data = dict(data)
+    data["content_url"] = presigned_note_url(data.pop("content_key"))
+    return data
+
+
+def read_note_text(note: Note) -> str:
+    """
+    Текст заметки из MinIO; ошибка чтения — APIException, а не пустой текст,
+    как в Note.get_content_text. Нужен перед сжиганием: заметка, чей текст
+    не прочитался, сгореть не должна.
+    """
+    if note.preloaded_content is not None:
+        return note.preloaded_content
+    if not note.content:
+        return ""
+    try:
+        return read_note_body(note.content.name).decode("utf-8")
+    except Exception:
+        logger.exception(f"Ошибка MinIO при чтении заметки {note.note_id}")
+        raise exceptions.APIException("Ошибка при получении заметки")
+
+
+def note_etag(data: dict) -> str:
+    """Сильный ETag ответа с заметкой: хеш записи кэша, без обращения к MinIO."""
+    return f'"{hashlib.sha256(orjson.dumps(data, option=orjson.OPT_SORT_KEYS)).hexdigest()[:32]}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Совпадает ли etag с If-None-Match запроса (слабое сравнение, RFC 9110)."""
+    etags = parse_etags(request.headers.get("If-None-Match", ""))
+    return "*" in etags or etag in (tag.removeprefix("W/") for tag in etags)
+
+
+def patch_note_caching(response: HttpResponseBase, is_public: bool, only_authorized: bool, dead_line) -> None:
+    """
+    Cache-Control/Vary ответа с заметкой (кроме burn_after_read — те не кэшируются вовсе).
+
+    Публичные заметки без only_authorized одинаковы для всех — их могут хранить
+    общие кэши, но не дольше dead_line и NOTE_PUBLIC_CACHE_MAX_AGE. Остальные
+    браузер хранит сам и перепроверяет по ETag при каждом чтении.
+    """
+    if is_public and not only_authorized:
+        max_age = int((dead_line - timezone.now()).total_seconds())
+        patch_cache_control(response, public=True, max_age=max(0, min(max_age, settings.NOTE_PUBLIC_CACHE_MAX_AGE)))
+        patch_vary_headers(response, ["Accept"])
+    else:
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ["Accept", "Authorization", "Cookie"])
+
+
+def note_response(request: Request, data: dict) -> Response:
+    """
+    Ответ с заметкой из записи кэша (или только что собранной): ETag, 304 и Cache-Control.
+
+    При совпадении If-None-Match отдаются только заголовки. Ответы с подписанной
+    ссылкой (content_url истекает) и burn_after_read не кэшируются.
+    """
+    if "content_key" in data or data["burn_after_read"]:
+        response = Response(with_content_url(data))
+        patch_cache_control(response, no_store=True)
+        return response
+
+    etag = note_etag(data)
+    response = Response(status=status.HTTP_304_NOT_MODIFIED) if etag_matches(request, etag) else Response(data)
+    response["ETag"] = etag
+    patch_note_caching(response, data["is_public"], data["only_authorized"], parse_datetime(data["dead_line"]))
+    return response
+
+
 class SearchNote(APIView):
     """
     Обрабатывает GET-запрос для поиска заметок по ключевому слову.
@@ -73,13 +212,12 @@ class SearchNote(APIView):
 
             # Формируем ключ кэша
             raw_key = f"{normalize_string(query)}:{limit}:{offset}"
-            cache_key = hashlib.md5(raw_key.encode("utf-8")).hexdigest()
+            cache_key = f"search:{hashlib.md5(raw_key.encode('utf-8')).hexdigest()}"
 
             # Пробуем достать результат из кэша
-            cached_result = rcache().get(cache_key)
-            if cached_result:
+            result = rcache().get(cache_key)
+            if result:
                 logger.info(f"Кэш найден по ключу: {cache_key}")
-                result = json.loads(cached_result)
             else:
                 index = get_meilisearch_index()
                 logger.debug(f"Выполняется поиск: query='{query}', limit={limit}, offset={offset}")
@@ -90,7 +228,7 @@ class SearchNote(APIView):
                 })
 
                 # Сохраняем результат в Redis
-                wcache().set(cache_key, json.dumps(result), timeout=60*5)
+                wcache().set(cache_key, result, timeout=jittered_timeout(60*5))
                 logger.info(f"Результат закэширован с ключом: {cache_key}")
 
             hits = result.get("hits", [])
@@ -166,8 +304,9 @@ class RandomNote(APIView):
         if not self._is_comment_allowed(request):
             queryset = queryset.filter(to_comment=None)
 
-        # Получаем случайную запись
-        random_note = queryset.order_by('?').first()
+        # Получаем случайную запись (свежесть не важна — читаем с реплики)
+        with stale_reads():
+            random_note = queryset.order_by('?').first()
 
         if not random_note:
             return Response(
@@ -231,62 +370,677 @@ class NoteAPI(ModelViewSet):
             note = get_object_or_404(Note.objects.all(), note_id=note_id, is_burned=False)
 
             check_note(note.dead_line, note.only_authorized, note.note_id, user)
+            check_note_owner(note.user_id, note.note_id)
 
-            # Автоматическое сгорание заметки после прочтения
+            # Автоматическое сгорание заметки после прочтения — только если текст прочитан
             if note.burn_after_read:
+                note.preloaded_content = read_note_text(note)
                 note.is_burned = True
                 note.save(update_fields=['is_burned'])
                 logger.info(f"Заметка {note_id} была сожжена после прочтения.")
 
             return note
 
-        except exceptions.APIException:
+        except (exceptions.APIException, Http404):
             raise  # Уже логировано выше
         except Exception as e:
             logger.exception("Неизвестная ошибка в get_object: %s", str(e))
             raise exceptions.APIException("Ошибка при получении заметки")
 
+    def list(self, request: drf_request.Request, *args: Any, **kwargs: Any) -> Response:
+        """
+        Возвращает список заметок.
+
+        Тела заметок страницы берутся из кэша note:{id} одним MGET, промахи
+        дописываются обратно одним pipeline.
+
+        Для авторизованного пользователя страницы кэшируются по ключу с версией,
+        которую сигналы post_save/post_delete увеличивают для владельца заметки.
+        Страница живёт не дольше самого раннего dead_line среди её заметок.
+        """
+        user = request.user
+        if not (user and user.is_authenticated):
+            return Response(self._list_data())
+
+        version = get_note_list_version(user.pk)
+        cache_key = note_list_cache_key(user.pk, version, request.query_params.items())
+
+        cached_data = rcache().get(cache_key)
+        if cached_data is not None:
+            logger.info(f"Список заметок пользователя {user.pk} найден в кэше.")
+            return Response(cached_data)
+
+        data, notes = self._list_data(with_notes=True)
+
+        timeout = note_list_cache_timeout(note.dead_line for note in notes)
+        if timeout > 0:
+            wcache().set(cache_key, data, timeout=timeout)
+            logger.info(f"Список заметок пользователя {user.pk} закэширован на {timeout} с.")
+
+        return Response(data)
+
+    def _list_data(self, with_notes: bool = False):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        notes = page if page is not None else list(queryset)
+
+        results = cached_notes_data(notes, lambda note: self.get_serializer(note).data)
+        if page is not None:
+            data = self.get_paginated_response(results).data
+        else:
+            data = results
+
+        return (data, notes) if with_notes else data
+
     def retrieve(self, request: drf_request.Request, *args: Any, **kwargs: Any) -> Response:
         """
         Получает одну заметку:
-        - Сначала пытается взять её из кэша (если нет флага burn_after_read)
-        - Если не найдено — извлекает из БД через get_object()
-        - Кладёт в кэш на 10 минут, если не требует сгорания после чтения
+        - Сначала пытается взять её из кэша (если нет флага burn_after_read);
+          отсутствующие, истёкшие и сожжённые ID кэшируются как 404 на минуту
+        - Если не найдено — извлекает из БД через get_object(); при одновременных
+          промахах из БД читает только один запрос, остальные ждут его запись в кэше
+        - Кладёт в кэш на ~10 минут (с разбросом TTL), если не требует сгорания после чтения
+        - Отдаёт ETag и при совпадении If-None-Match отвечает 304 без тела (note_response)
         """
         try:
             note_id = self.kwargs.get("pk")
-            cache_key = f"note:{note_id}"
-
-            # Проверка в кэше
-            cached_data = rcache().get(cache_key)
-            if cached_data is not None:
-                logger.info(f"Заметка {note_id} найдена в кэше.")
-                check_note(
-                    dead_line=parse_datetime(cached_data["dead_line"]),
-                    only_authorized=cached_data["only_authorized"],
-                    note_id=note_id,
-                    user=request.user
-                )
-                return Response(cached_data)
-
-            # Если нет в кэше — достаём из БД
-            note = self.get_object()
-            serializer = self.get_serializer(note)
-            data = serializer.data
-
-            # Кэшируем только если не сжигается после прочтения
-            if not note.burn_after_read:
-                wcache().set(cache_key, data, timeout=600)  # 10 минут
-                logger.info(f"Заметка {note_id} закэширована.")
-
-            return Response(data)
+            presigned = settings.NOTE_CONTENT_DELIVERY == "presigned"
+            cache_key = note_meta_cache_key(note_id) if presigned else note_cache_key(note_id)
+            missing_key = missing_note_key(note_id)
+
+            # Проверка в кэше: сама заметка или отметка о её отсутствии (один MGET)
+            cached = rcache().get_many([cache_key, missing_key])
+            if missing_key in cached:
+                logger.info(f"Заметка {note_id} отмечена в кэше как отсутствующая.")
+                raise exceptions.NotFound("No Note matches the given query.")
+
+            cached_data = cached.get(cache_key)
+            if cached_data is None:
+                # Если нет в кэше — достаём из БД (single-flight)
+                def build():
+                    try:
+                        note = self.get_object()
+                    except (Http404, exceptions.NotFound):
+                        # Нет, истекла или сожжена — запоминаем, чтобы не ходить в БД повторно
+                        wcache().set(missing_key, 1, timeout=NOTE_MISSING_CACHE_TIMEOUT)
+                        raise
+                    if presigned and not note.burn_after_read:
+                        # Текст не читаем: клиент скачает его по ссылке прямо из MinIO
+                        context = {**self.get_serializer_context(), "include_content": False}
+                        meta = {**NoteSerializer(note, context=context).data, "content_key": note.content.name}
+                        return meta, NOTE_CACHE_TIMEOUT
+                    serializer = self.get_serializer(note)
+                    # Кэшируем только если не сжигается после прочтения
+                    return serializer.data, None if note.burn_after_read else NOTE_CACHE_TIMEOUT
+
+                data, from_cache = fetch_single_flight(cache_key, build, missing_key)
+                if data is MISSING:
+                    raise exceptions.NotFound("No Note matches the given query.")
+                if not from_cache:
+                    logger.info(f"Заметка {note_id} получена из БД.")
+                    return note_response(request, data)
+                cached_data = data
+
+            logger.info(f"Заметка {note_id} найдена в кэше.")
+            check_note(
+                dead_line=parse_datetime(cached_data["dead_line"]),
+                only_authorized=cached_data["only_authorized"],
+                note_id=note_id,
+                user=request.user
+            )
+            check_note_owner(cached_data["user"], note_id)
+            return note_response(request, cached_data)
 
-        except exceptions.APIException:
+        except (exceptions.APIException, Http404):
             raise
         except Exception as e:
             logger.exception("Неизвестная ошибка в retrieve: %s", str(e))
             raise exceptions.APIException("Ошибка при получении заметки")
     
+class NoteContent(APIView):
+    """
+    Отдаёт текст заметки потоком прямо из MinIO (GET /notes/<id>/content/).
+
+    Тело не собирается в памяти: куски объекта передаются клиенту по мере чтения,
+    поэтому память воркера не зависит от размера заметки. Объекты, сжатые кодеком
+    NOTE_STORAGE_CODEC, разжимаются тем же потоком. Поддерживается один
+    диапазон в заголовке Range (206 Partial Content). Проверки те же, что в
+    NoteAPI.retrieve: check_note, негативный кэш и сжигание после прочтения;
+    заметки burn_after_read отдаются только целиком. Для текстов, хранящихся
+    по хешу, ETag — сам хеш, и If-None-Match отвечается 304 без чтения MinIO.
+    """
+    permission_classes = [IsAuthenticatedOrReadOnly]
+
+    range_pattern = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+    def get(self, request: Request, pk: str) -> HttpResponseBase:
+        missing_key = missing_note_key(pk)
+        if rcache().get(missing_key) is not None:
+            logger.info(f"Заметка {pk} отмечена в кэше как отсутствующая.")
+            raise exceptions.NotFound("No Note matches the given query.")
+
+        note = Note.objects.filter(note_id=pk, is_burned=False).first()
+        try:
+            if note is None:
+                raise exceptions.NotFound("No Note matches the given query.")
+            check_note(note.dead_line, note.only_authorized, note.note_id, request.user)
+            check_note_owner(note.user_id, note.note_id)
+        except exceptions.NotFound:
+            wcache().set(missing_key, 1, timeout=NOTE_MISSING_CACHE_TIMEOUT)
+            raise
+
+        byte_range = None if note.burn_after_read else self._requested_range(request)
+
+        key = note.content.name
+        etag = None if note.burn_after_read else content_etag(key)
+        if etag is not None and etag_matches(request, etag):
+            # Текст не менялся — отвечаем без обращения к MinIO
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+            return self._with_caching(response, note, etag)
+
+        obj = self._open(pk, key, byte_range)
+        if byte_range and (obj is None or object_encoding(obj)):
+            # Диапазон сжатого объекта относится к тексту, а не к байтам в MinIO
+            # (а 416 от MinIO мог прийти по размеру сжатого) — берём объект целиком
+            if obj is not None:
+                obj["Body"].close()
+            obj = self._open(pk, key, None)
+            if not object_encoding(obj):
+                obj["Body"].close()
+                response = HttpResponse(status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+                response["Content-Range"] = f"bytes */{obj['ContentLength']}"
+                return response
+
+        if note.burn_after_read:
+            # Сжигаем только после успешного get_object: при ошибке MinIO заметка не пропадает
+            note.is_burned = True
+            note.save(update_fields=["is_burned"])
+            logger.info(f"Заметка {pk} была сожжена после прочтения.")
+
+        encoding = object_encoding(obj)
+        if encoding:
+            response = self._decoded_response(note, obj, encoding, byte_range)
+            return self._with_caching(response, note, etag)
+
+        partial = "ContentRange" in obj
+        response = StreamingHttpResponse(
+            iter_object_body(obj["Body"]),
+            status=status.HTTP_206_PARTIAL_CONTENT if partial else status.HTTP_200_OK,
+            content_type="text/plain; charset=utf-8",
+        )
+        response["Content-Length"] = obj["ContentLength"]
+        response["Accept-Ranges"] = "none" if note.burn_after_read else "bytes"
+        if partial:
+            response["Content-Range"] = obj["ContentRange"]
+        return self._with_caching(response, note, etag)
+
+    @staticmethod
+    def _with_caching(response: HttpResponseBase, note: Note, etag: str | None) -> HttpResponseBase:
+        if note.burn_after_read:
+            patch_cache_control(response, no_store=True)
+            return response
+        if etag is not None:
+            response["ETag"] = etag
+        patch_note_caching(response, note.is_public, note.only_authorized, note.dead_line)
+        return response
+
+    @staticmethod
+    def _open(pk: str, key: str, byte_range: str | None) -> dict | None:
+        """Ответ get_object; None, если диапазон не попал в объект."""
+        try:
+            return open_note_object(key, byte_range)
+        except ClientError as e:
+            code = e.response.get("Error", {}).get("Code")
+            if code == "InvalidRange":
+                return None
+            if code in ("NoSuchKey", "404"):
+                logger.error(f"Файл заметки {pk} отсутствует в MinIO.")
+                raise exceptions.NotFound("Note content is missing.")
+            logger.exception(f"Ошибка MinIO при чтении заметки {pk}")
+            raise exceptions.APIException("Ошибка при получении заметки")
+
+    def _decoded_response(self, note: Note, obj: dict, encoding: str, byte_range: str | None) -> HttpResponseBase:
+        """
+        Разжимает сжатый объект потоком и отдаёт из текста запрошенный диапазон.
+
+        Размер текста берётся из метаданных объекта. У объектов, записанных без
+        метки размера, он неизвестен без полного разжатия, поэтому Range для них
+        игнорируется и текст отдаётся целиком без Content-Length.
+        """
+        size = object_text_size(obj)
+        if size is None:
+            byte_range = None
+
+        first, last = 0, (size or 0) - 1
+        if byte_range:
+            start, end = self.range_pattern.match(byte_range).groups()
+            if start:
+                first, last = int(start), min(int(end), size - 1) if end else size - 1
+            else:
+                first = max(size - int(end), 0)
+            if first >= size or last < first:
+                obj["Body"].close()
+                response = HttpResponse(status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+                response["Content-Range"] = f"bytes */{size}"
+                return response
+
+        chunks = iter_decode_note_body(iter_object_body(obj["Body"]), encoding, STREAM_CHUNK_SIZE)
+        if byte_range:
+            chunks = self._slice(chunks, first, last)
+        response = StreamingHttpResponse(
+            chunks,
+            status=status.HTTP_206_PARTIAL_CONTENT if byte_range else status.HTTP_200_OK,
+            content_type="text/plain; charset=utf-8",
+        )
+        if size is not None:
+            response["Content-Length"] = last - first + 1
+        response["Accept-Ranges"] = "none" if note.burn_after_read or size is None else "bytes"
+        if byte_range:
+            response["Content-Range"] = f"bytes {first}-{last}/{size}"
+        return response
+
+    @staticmethod
+    def _slice(chunks: Iterator[bytes], first: int, last: int) -> Iterator[bytes]:
+        """Байты first..last потока: до first куски пропускаются, после last чтение прекращается."""
+        position = 0
+        try:
+            for chunk in chunks:
+                chunk_end = position + len(chunk)
+                if chunk_end > first:
+                    yield chunk[max(first - position, 0):last + 1 - position]
+                if chunk_end > last:
+                    return
+                position = chunk_end
+        finally:
+            chunks.close()
+
+    def _requested_range(self, request: Request) -> str | None:
+        """Один диапазон bytes=a-b / a- / -n; прочие формы игнорируются и отдаётся всё тело."""
+        header = request.headers.get("Range", "").strip()
+        match = self.range_pattern.match(header)
+        if not match or match.groups() == ("", ""):
+            return None
+        return header
+
+
+class NoteBatch(APIView):
+    """
+    Возвращает несколько заметок за один запрос (GET /notes/batch/?ids=a,b,c).
+
+    Для каждой заметки действуют те же правила, что и в NoteAPI.retrieve
+    (check_note, негативный кэш, burn_after_read), но обращения идут пачкой:
+    один MGET к кэшу, один запрос WHERE note_id IN (...) для промахов,
+    параллельное чтение текстов из MinIO и одна запись промахов в кэш.
+
+    Ответ: {"results": [...найденные заметки в порядке ids...],
+            "errors": {note_id: {"status": код, "detail": текст}}}
+    """
+    permission_classes = [IsAuthenticatedOrReadOnly]
+
+    def get(self, request: Request) -> Response:
+        note_ids = list(dict.fromkeys(i.strip() for i in request.query_params.get("ids", "").split(",") if i.strip()))
+        if not note_ids:
+            return Response({"error": "Missing required query parameter 'ids'"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(note_ids) > settings.NOTES_BATCH_MAX_SIZE:
+            return Response(
+                {"error": f"Не больше {settings.NOTES_BATCH_MAX_SIZE} заметок за запрос"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        results: dict[str, dict] = {}
+        errors: dict[str, dict] = {}
+
+        # 1. Кэш: заметки и отметки об отсутствии одним MGET
+        cached = rcache().get_many(
+            [note_cache_key(note_id) for note_id in note_ids] + [missing_note_key(note_id) for note_id in note_ids]
+        )
+        misses = []
+        for note_id in note_ids:
+            if missing_note_key(note_id) in cached:
+                errors[note_id] = self._error(exceptions.NotFound("No Note matches the given query."))
+                continue
+            cached_data = cached.get(note_cache_key(note_id))
+            if cached_data is None:
+                misses.append(note_id)
+                continue
+            try:
+                check_note(parse_datetime(cached_data["dead_line"]), cached_data["only_authorized"], note_id, request.user)
+                results[note_id] = cached_data
+            except exceptions.APIException as e:
+                errors[note_id] = self._error(e)
+
+        # Заметки удаляемых аккаунтов не отдаём (одна проверка на всех владельцев)
+        deleted = deleted_owners(data["user"] for data in results.values())
+        for note_id in [note_id for note_id, data in results.items() if data["user"] in deleted]:
+            del results[note_id]
+            errors[note_id] = self._error(exceptions.NotFound("No Note matches the given query."))
+
+        # 2. Промахи: один запрос к БД
+        if misses:
+            self._load_misses(request, misses, results, errors)
+
+        logger.info(f"Пакетное чтение {len(note_ids)} заметок: {len(note_ids) - len(misses)} из кэша, ошибок {len(errors)}.")
+        return Response({
+            "results": [results[note_id] for note_id in note_ids if note_id in results],
+            "errors": errors,
+        })
+
+    def _load_misses(self, request: Request, misses: list[str], results: dict, errors: dict) -> None:
+        notes = {note.note_id: note for note in Note.objects.filter(note_id__in=misses, is_burned=False)}
+
+        deleted = deleted_owners(note.user_id for note in notes.values())
+        missing, readable = [], []
+        for note_id in misses:
+            note = notes.get(note_id)
+            try:
+                if note is None or note.user_id in deleted:
+                    raise exceptions.NotFound("No Note matches the given query.")
+                check_note(note.dead_line, note.only_authorized, note.note_id, request.user)
+                readable.append(note)
+            except exceptions.APIException as e:
+                if isinstance(e, exceptions.NotFound):
+                    missing.append(note_id)
+                errors[note_id] = self._error(e)
+
+        if missing:
+            # Нет, истекли или сожжены — запоминаем, чтобы не ходить в БД повторно
+            wcache().set_many({missing_note_key(note_id): 1 for note_id in missing}, timeout=NOTE_MISSING_CACHE_TIMEOUT)
+
+        # 3. Тексты из MinIO параллельно — до сжигания: post_save из _burn получает
+        # уже прочитанный текст, а заметки, чей текст не прочитался, не сгорают и не кэшируются
+        def read(note: Note) -> str | exceptions.APIException:
+            try:
+                return read_note_text(note)
+            except exceptions.APIException as e:
+                return e
+
+        with ThreadPoolExecutor(max_workers=min(settings.NOTES_BATCH_READ_WORKERS, len(readable)) or 1) as executor:
+            contents = list(executor.map(read, readable))
+
+        loaded = []
+        for note, content in zip(readable, contents):
+            if isinstance(content, exceptions.APIException):
+                errors[note.note_id] = self._error(content)
+                continue
+            note.preloaded_content = content
+            loaded.append(note)
+        readable = loaded
+
+        burned = self._burn([note for note in readable if note.burn_after_read])
+        readable = [note for note in readable if not note.burn_after_read or note.note_id in burned]
+        for note_id in {note.note_id for note in notes.values() if note.burn_after_read} - burned:
+            errors.setdefault(note_id, self._error(exceptions.NotFound("No Note matches the given query.")))
+
+        to_cache = {}
+        for note in readable:
+            data = NoteSerializer(note).data
+            results[note.note_id] = data
+            if not note.burn_after_read:
+                to_cache[note_cache_key(note.note_id)] = data
+
+        if to_cache:
+            wcache().set_many(to_cache, timeout=jittered_timeout(NOTE_CACHE_TIMEOUT))
+
+    @staticmethod
+    def _burn(notes: list[Note]) -> set[str]:
+        """
+        Атомарно сжигает заметки burn_after_read и возвращает ID тех, что сжёг этот запрос.
+
+        Заметку, которую одновременно прочитал другой запрос, повторно не отдаём.
+        post_save рассылается вручную, как при note.save(update_fields=["is_burned"]).
+        """
+        if not notes:
+            return set()
+
+        with transaction.atomic(using="default"):
+            burned = set(
+                Note.objects.using("default").select_for_update()
+                .filter(note_id__in=[note.note_id for note in notes], is_burned=False)
+                .values_list("note_id", flat=True)
+            )
+            Note.objects.filter(note_id__in=burned).update(is_burned=True)
+
+        for note in notes:
+            if note.note_id in burned:
+                note.is_burned = True
+                post_save.send(sender=Note, instance=note, created=False, update_fields={"is_burned"}, raw=False, using="default")
+                logger.info(f"Заметка {note.note_id} была сожжена после прочтения.")
+        return burned
+
+    @staticmethod
+    def _error(exc: exceptions.APIException) -> dict:
+        return {"status": exc.status_code, "detail": str(exc.detail)}
+
+
+class BulkNoteCreate(APIView):
+    """
+    Создаёт пачку заметок за один запрос (POST /notes/bulk/, список объектов как в POST /notes/).
+
+    Идентификаторы резервируются у sidecar одним запросом, тексты загружаются
+    в MinIO параллельно ещё до транзакции, строки вставляются одним bulk_create, а публичные
+    заметки индексируются одной задачей. Сигналы post_save при этом не
+    срабатывают, поэтому их работа (версия списков, отметки отсутствия,
+    индексация) выполняется здесь один раз на пачку.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request: Request) -> Response:
+        if not isinstance(request.data, list) or not request.data:
+            return Response({"error": "Ожидается непустой список заметок"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(request.data) > settings.NOTES_BULK_MAX_SIZE:
+            return Response(
+                {"error": f"Не больше {settings.NOTES_BULK_MAX_SIZE} заметок за запрос"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        serializer = NoteSerializer(data=request.data, many=True, context={"request": request})
+        serializer.is_valid(raise_exception=True)
+        items = serializer.validated_data
+
+        note_ids = get_keys_from_sidecar(len(items))
+        if note_ids is None:
+            return Response({"error": "Не удалось получить идентификаторы заметок"}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+        texts = {note_id: item["content"] for note_id, item in zip(note_ids, items)}
+        keys = {note_id: note_content_key(text.encode("utf-8")) for note_id, text in texts.items()}
+        notes = [
+            Note(
+                note_id=note_id,
+                user=request.user,
+                content=keys[note_id],
+                dead_line=item.get("dead_line", INFINITY),
+                only_authorized=item.get("only_authorized", False),
+                to_comment=item.get("to_comment"),
+                burn_after_read=item.get("burn_after_read", False),
+                is_public=item.get("is_public", False),
+            )
+            for note_id, item in zip(note_ids, items)
+        ]
+
+        # Одинаковые тексты (в пачке и среди уже сохранённых) загружаются один раз
+        contents = {keys[note_id]: text for note_id, text in texts.items()}
+        try:
+            # Загрузка — до транзакции: медленный MinIO не держит соединение и блокировки
+            upload_note_contents(contents, max_workers=settings.NOTES_BULK_UPLOAD_WORKERS)
+            with transaction.atomic(using="default"):
+                lock_note_contents(contents)
+                # До блокировки сборка мусора могла удалить объекты без ссылок — их
+                # проверяем заново и догружаем; на объекты со ссылками она не покушается
+                referenced = set(
+                    Note.objects.using("default").filter(content__in=list(contents)).values_list("content", flat=True)
+                )
+                unreferenced = {key: text for key, text in contents.items() if key not in referenced}
+                if unreferenced:
+                    upload_note_contents(unreferenced, max_workers=settings.NOTES_BULK_UPLOAD_WORKERS)
+                Note.objects.bulk_create(notes)
+        except Exception:
+            logger.exception(f"Ошибка при пакетном создании {len(notes)} заметок")
+            try:
+                release_note_contents(list(contents))
+            except Exception:
+                logger.exception("Не удалось удалить загруженные файлы пачки")
+            raise exceptions.APIException("Ошибка при создании заметок")
+
+        for note in notes:
+            note.preloaded_content = texts[note.note_id]
+        data = [NoteSerializer(note).data for note in notes]
+
+        bump_note_list_version(request.user.pk)
+        forget_missing_notes(note_ids)
+        public_notes = [note_data for note_data in data if note_data["is_public"]]
+        if public_notes:
+            index_public_notes.delay(public_notes)
+
+        logger.info(f"Пользователь {request.user.pk} создал пачку из {len(notes)} заметок.")
+        return Response(data, status=status.HTTP_201_CREATED)
+
+
+class NoteUpload(APIView):
+    """
+    Двухфазное создание заметки, текст которой загружается напрямую в MinIO.
+
+    1. POST /notes/uploads/ {метаданные как в POST /notes/, без content, + size} —
+       резервирует ID и начинает multipart-загрузку; в ответе подписанные
+       ссылки на PUT каждой части размером part_size.
+    2. Клиент загружает части прямо в MinIO и запоминает ETag из ответов.
+    3. POST /notes/uploads/<id>/complete/ (NoteUploadComplete) собирает объект
+       и создаёт заметку. DELETE /notes/uploads/<id>/ отменяет загрузку.
+
+    Тело заметки не проходит через воркеры Django. Незавершённая загрузка
+    хранится в кэше NOTE_UPLOAD_EXPIRES секунд.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request: Request) -> Response:
+        serializer = NoteUploadSerializer(data=request.data, context={"request": request})
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        note_id = get_key_from_sidecar()
+        if note_id is None:
+            return Response({"error": "Не удалось получить идентификатор заметки"}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+        key = f"{note_id}.txt"
+        upload_id, parts = create_note_upload(key, data["size"])
+
+        to_comment = data.get("to_comment")
+        scache().set(note_upload_key(note_id), {
+            "user_id": request.user.pk,
+            "upload_id": upload_id,
+            "key": key,
+            "size": data["size"],
+            "dead_line": data.get("dead_line", INFINITY).isoformat(),
+            "only_authorized": data.get("only_authorized", False),
+            "to_comment": to_comment.pk if to_comment else None,
+            "burn_after_read": data.get("burn_after_read", False),
+            "is_public": data.get("is_public", False),
+        }, timeout=settings.NOTE_UPLOAD_EXPIRES)
+
+        logger.info(f"Начата загрузка заметки {note_id}: {data['size']} байт, частей {len(parts)}.")
+        return Response(
+            {
+                "note_id": note_id,
+                "part_size": settings.NOTE_UPLOAD_PART_SIZE,
+                "parts": parts,
+                "expires_in": settings.NOTE_UPLOAD_EXPIRES,
+            },
+            status=status.HTTP_201_CREATED,
+        )
+
+    def delete(self, request: Request, pk: str) -> Response:
+        pending = get_pending_upload(request, pk)
+        abort_note_upload(pending["key"], pending["upload_id"])
+        scache().delete(note_upload_key(pk))
+        logger.info(f"Загрузка заметки {pk} отменена.")
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class NoteUploadComplete(APIView):
+    """
+    Завершает загрузку из NoteUpload: собирает части в объект и создаёт заметку.
+
+    Строка вставляется через bulk_create без сигналов, чтобы post_save не читал
+    тело в веб-воркере; публичная заметка индексируется задачей index_note.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request: Request, pk: str) -> Response:
+        pending = get_pending_upload(request, pk)
+        serializer = NoteUploadCompleteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        try:
+            size = complete_note_upload(pending["key"], pending["upload_id"], serializer.validated_data["parts"])
+        except ClientError as e:
+            code = e.response.get("Error", {}).get("Code")
+            logger.warning(f"Не удалось завершить загрузку заметки {pk}: {code}")
+            return Response({"error": f"Не удалось завершить загрузку: {code}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        if size != pending["size"]:
+            self._discard(pk)
+            return Response(
+                {"error": f"Загружено {size} байт вместо заявленных {pending['size']}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        # Родитель комментария мог исчезнуть за время загрузки — проверяем, как NoteSerializer
+        to_comment = None
+        if pending["to_comment"] is not None:
+            try:
+                to_comment = NoteSerializer().fields["to_comment"].run_validation(pending["to_comment"])
+            except exceptions.ValidationError as e:
+                self._discard(pk)
+                return Response({"to_comment": e.detail}, status=status.HTTP_400_BAD_REQUEST)
+
+        note = Note(
+            note_id=pk,
+            user=request.user,
+            content=pending["key"],
+            dead_line=parse_datetime(pending["dead_line"]),
+            only_authorized=pending["only_authorized"],
+            to_comment=to_comment,
+            burn_after_read=pending["burn_after_read"],
+            is_public=pending["is_public"],
+        )
+        try:
+            with transaction.atomic(using="default"):
+                Note.objects.bulk_create([note])
+        except IntegrityError:
+            # Отложенный FK проверяется при коммите: родителя удалили после проверки,
+            # либо заметку уже создал параллельный complete
+            duplicate = Note.objects.using("default").filter(note_id=pk).exists()
+            self._discard(pk)
+            if duplicate:
+                logger.warning(f"Загрузка заметки {pk} уже завершена другим запросом.")
+                return Response({"error": "Загрузка уже завершена"}, status=status.HTTP_409_CONFLICT)
+            logger.warning(f"Родитель комментария {pk} удалён во время завершения загрузки.")
+            return Response({"to_comment": ["Заметка для комментария не найдена"]}, status=status.HTTP_400_BAD_REQUEST)
+        scache().delete(note_upload_key(pk))
+
+        # Работа сигналов post_save, без чтения тела
+        bump_note_list_version(request.user.pk)
+        forget_missing_notes([pk])
+        if note.is_public:
+            index_note.delay(pk)
+
+        logger.info(f"Заметка {pk} создана из загрузки ({size} байт).")
+        return Response(NoteSerializer(note, context={"include_content": False}).data, status=status.HTTP_201_CREATED)
+
+    @staticmethod
+    def _discard(pk: str) -> None:
+        """Освобождает собранный объект (если на него не ссылается заметка) и забывает загрузку."""
+        delete_from_minio(pk)
+        scache().delete(note_upload_key(pk))
+
+
+def get_pending_upload(request: Request, note_id: str) -> dict:
+    """Незавершённая загрузка текущего пользователя или 404."""
+    pending = scache().get(note_upload_key(note_id))
+    if pending is None or pending["user_id"] != request.user.pk:
+        raise exceptions.NotFound("Upload not found or expired.")
+    return pending
+
+
 class CommentList(APIView):
     pagination_class = CommentPagination
     permission_classes = [IsAuthenticatedOrReadOnly]
@@ -322,9 +1076,9 @@ class CommentList(APIView):
         # 4. Пагинация и сериализация
         paginator = self.pagination_class()
         page = paginator.paginate_queryset(queryset, request)
-        serializer = NoteSerializer(page, many=True)
+        results = cached_notes_data(page, lambda comment: NoteSerializer(comment).data)
 
-        return paginator.get_paginated_response(serializer.data)
+        return paginator.get_paginated_response(results)
 
     def _is_count_only_requested(self, request):
         """Проверяет, нужно ли вернуть только количество комментариев."""
@@ -377,6 +1131,7 @@ class UpdateAccountView(APIView):
         )
         if serializer.is_valid():
             serializer.save()
+            forget_cached_user(request.user.pk)
             return Response(serializer.data, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -389,6 +1144,7 @@ class UpdateAccountView(APIView):
         )
         if serializer.is_valid():
             serializer.save()
+            forget_cached_user(request.user.pk)
             return Response(serializer.data, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -397,6 +1153,47 @@ class DeleteAccountView(APIView):
     permission_classes = [IsAuthenticated]
 
     def delete(self, request: Request):
+        """
+        Отключает аккаунт сразу, а данные удаляет в фоне порциями (purge_account).
+
+        Время запроса не зависит от числа заметок: заметки скрывает одна
+        отметка mark_account_deleted (её проверяют все чтения заметок),
+        а версия списков сбрасывается одним INCR. Кэш и строки заметок
+        удаляет purge_account. Отметка и задача ставятся только после
+        коммита отключения. Прогресс удаления — в AccountDeletionStatusView по job_id.
+        """
         user = request.user
-        user.delete()
-        return Response({"message": "Аккаунт удален"}, status=status.HTTP_204_NO_CONTENT)
\ No newline at end of file
+        job_id = uuid.uuid4().hex
+
+        def start_purge():
+            forget_cached_user(user.pk)
+            mark_account_deleted(user.pk)
+            bump_note_list_version(user.pk)
+            set_account_deletion_progress(job_id, "pending", 0)
+            purge_account.delay(user.pk, job_id)
+
+        with transaction.atomic(using="default"):
+            CustomUser.objects.filter(pk=user.pk).update(is_active=False)
+            transaction.on_commit(start_purge, using="default")
+        logout(request)
+
+        logger.info(f"Аккаунт {user.pk} отключён, удаление данных поставлено в очередь ({job_id}).")
+        return Response(
+            {
+                "message": "Аккаунт удаляется",
+                "job_id": job_id,
+                "status_url": reverse("delete_account_status", args=[job_id], request=request),
+            },
+            status=status.HTTP_202_ACCEPTED,
+        )
+
+
+class AccountDeletionStatusView(APIView):
+    """Прогресс фонового удаления аккаунта (job_id выдаётся DeleteAccountView)."""
+    permission_classes = [AllowAny]
+
+    def get(self, request: Request, job_id: str):
+        progress = get_account_deletion_progress(job_id)
+        if progress is None:
+            raise exceptions.NotFound("Задача удаления не найдена.")
+        return Response(progress)
\ No newline at end of file
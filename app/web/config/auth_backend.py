@@ -0,0 +1,27 @@
+from asgiref.sync import sync_to_async
+from django.contrib.auth.backends import ModelBackend
+
+from util.cache import cache_user, get_cached_user
+
+
+class CachedModelBackend(ModelBackend):
+    """
+    ModelBackend, берущий пользователя сессии из кэша на USER_CACHE_TIMEOUT секунд.
+
+    AuthenticationMiddleware вызывает get_user на каждый запрос с сессией;
+    с кэшем запрос не делает SELECT в customuser. Запись ключуется по user_id,
+    поэтому сброс (forget_cached_user) действует на все сессии пользователя.
+    Хеш сессии по-прежнему сверяется с паролем кэшированного пользователя.
+    """
+
+    def get_user(self, user_id):
+        user = get_cached_user(user_id)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is None:
+                return None
+            cache_user(user)
+        return user if self.user_can_authenticate(user) else None
+
+    async def aget_user(self, user_id):
+        return await sync_to_async(self.get_user)(user_id)
@@ -1,5 +1,8 @@
 import os
 from celery import Celery
+from celery.signals import task_prerun
+
+from .db_router import start_request
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
@@ -11,6 +14,11 @@ app.config_from_object('django.conf:settings', namespace='CELERY')
 # Явно указываем, где искать задачи
 app.autodiscover_tasks(['tasks'])
 
+@task_prerun.connect
+def reset_db_routing(**kwargs):
+    # Каждая задача начинает с чтения с реплики, как отдельный запрос
+    start_request(pinned=False)
+
 @app.task(bind=True)
 def debug_task(self):
     print(f'Request: {self.request!r}')
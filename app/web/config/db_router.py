@@ -1,14 +1,156 @@
 import logging, sys
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
 logger = logging.getLogger("myapp")
 
+# Чтения текущего запроса закреплены за мастером (недавняя запись клиента)
+_pinned_to_master: ContextVar[bool] = ContextVar("pinned_to_master", default=False)
+# В рамках текущего запроса была запись в мастер
+_write_happened: ContextVar[bool] = ContextVar("write_happened", default=False)
+# Чтения, допускающие отставание реплики, даже при закреплении
+_stale_ok: ContextVar[bool] = ContextVar("stale_ok", default=False)
+# Реплика, выбранная для текущего запроса (все чтения запроса идут в одну)
+_request_replica: ContextVar[str | None] = ContextVar("request_replica", default=None)
+
+# Отставание реплики в секундах; 0 если реплика догнала мастер или узел не в recovery
+REPLICATION_LAG_QUERY = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+
+def start_request(pinned: bool) -> None:
+    """Сбрасывает состояние маршрутизации в начале запроса."""
+    _pinned_to_master.set(pinned)
+    _write_happened.set(False)
+    _stale_ok.set(False)
+    _request_replica.set(None)
+
+
+def write_happened() -> bool:
+    return _write_happened.get()
+
+
+@contextmanager
+def stale_reads():
+    """
+    Разрешает читать с реплики внутри блока, даже если запрос закреплён за мастером.
+    Используется для выборок, которым не важна свежесть (например, случайная заметка).
+    """
+    token = _stale_ok.set(True)
+    try:
+        yield
+    finally:
+        _stale_ok.reset(token)
+
+
+class ReplicaPool:
+    """
+    Набор реплик с весами и периодической проверкой отставания.
+
+    Проверка выполняется лениво, не чаще раза в `check_interval` секунд на процесс,
+    в фоновом потоке: запрос, заметивший устаревшее состояние, не ждёт
+    connect_timeout недоступной реплики и сразу использует последнее известное.
+    Реплики с отставанием больше `max_lag` или недоступные исключаются из выбора.
+    """
+
+    def __init__(self, weights: dict[str, int], max_lag: float, check_interval: float):
+        self.weights = {alias: weight for alias, weight in weights.items() if weight > 0}
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.healthy = dict.fromkeys(self.weights, True)
+        self.checked_at = float("-inf")  # monotonic() считается от загрузки хоста, а не от нуля
+        self._lock = threading.Lock()
+
+    def choose(self) -> str | None:
+        """Возвращает алиас здоровой реплики с учётом весов или None, если таких нет."""
+        self._refresh_if_stale()
+        candidates = [alias for alias in self.weights if self.healthy[alias]]
+        if not candidates:
+            return None
+        return random.choices(candidates, weights=[self.weights[a] for a in candidates])[0]
+
+    def _refresh_if_stale(self) -> None:
+        if time.monotonic() - self.checked_at < self.check_interval:
+            return
+        if not self._lock.acquire(blocking=False):
+            return  # проверку уже выполняет другой поток
+        try:
+            threading.Thread(target=self._refresh_in_background, name="replica-probe", daemon=True).start()
+        except Exception:
+            self._lock.release()
+            raise
+
+    def _refresh_in_background(self) -> None:
+        try:
+            self.refresh()
+        finally:
+            # Соединения потока проверки больше никому не нужны
+            for alias in self.weights:
+                connections[alias].close()
+            self._lock.release()
+
+    def refresh(self) -> None:
+        """Проверяет отставание всех реплик и обновляет состояние пула."""
+        for alias in self.weights:
+            healthy = self._probe(alias)
+            if healthy != self.healthy[alias]:
+                logger.warning(f"Реплика {alias} {'возвращена в пул' if healthy else 'исключена из пула'}")
+            self.healthy[alias] = healthy
+        self.checked_at = time.monotonic()
+
+    def _probe(self, alias: str) -> bool:
+        try:
+            with connections[alias].cursor() as cursor:
+                cursor.execute(REPLICATION_LAG_QUERY)
+                lag = float(cursor.fetchone()[0])
+        except Exception as e:
+            logger.warning(f"Реплика {alias} недоступна: {e}")
+            return False
+
+        if lag > self.max_lag:
+            logger.warning(f"Отставание реплики {alias} {lag:.1f} с превышает {self.max_lag} с")
+            return False
+        return True
+
+
 class MasterReplicaRouter:
+    def __init__(self):
+        self.replicas = ReplicaPool(
+            weights=getattr(settings, "DATABASE_REPLICAS", {"replica": 1}),
+            max_lag=getattr(settings, "DB_REPLICA_MAX_LAG_SECONDS", 10),
+            check_interval=getattr(settings, "DB_REPLICA_CHECK_INTERVAL_SECONDS", 5),
+        )
+
     def db_for_read(self, model, **hints):
         if 'test' in sys.argv:
             return 'default'  # во время тестов читаем с default
-        return 'replica'
+        if not _stale_ok.get() and (_pinned_to_master.get() or _write_happened.get()):
+            logger.debug("READ from master (read-your-writes)")
+            return 'default'
+
+        alias = _request_replica.get()
+        if alias is None:
+            alias = self.replicas.choose()
+            if alias is None:
+                logger.warning("Нет здоровых реплик — читаем с мастера")
+                alias = 'default'
+            _request_replica.set(alias)
+        return alias
 
     def db_for_write(self, model, **hints):
         logger.debug(f"WRITE to master")
+        _write_happened.set(True)
         return 'default'
 
     def allow_relation(self, obj1, obj2, **hints):
@@ -16,4 +158,3 @@ class MasterReplicaRouter:
 
     def allow_migrate(self, db, app_label, model_name=None, **hints):
         return db == 'default'  # миграции только на мастере
-
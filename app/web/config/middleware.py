@@ -0,0 +1,69 @@
+import logging
+import math
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from .db_router import start_request, write_happened
+
+logger = logging.getLogger("myapp")
+
+
+class ReadYourWritesMiddleware:
+    """
+    Закрепляет чтения клиента за мастером на короткое окно после записи.
+
+    После запроса, выполнившего запись, клиент получает cookie со временем
+    окончания окна. Пока окно не истекло, MasterReplicaRouter отправляет
+    его чтения в default, остальные клиенты продолжают читать с реплики.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.cookie_name = getattr(settings, "DB_PIN_COOKIE_NAME", "db_pin")
+        self.pin_seconds = getattr(settings, "DB_READ_YOUR_WRITES_SECONDS", 5)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        start_request(pinned=self._is_pinned(request))
+        response = self.get_response(request)
+        return self._process_response(response)
+
+    async def __acall__(self, request):
+        start_request(pinned=self._is_pinned(request))
+        response = await self.get_response(request)
+        return self._process_response(response)
+
+    def _process_response(self, response):
+        if write_happened():
+            # Округляем вниз: иначе значение cookie могло бы превысить now + pin_seconds
+            # и следующий быстрый запрос отбросил бы его как поддельное
+            pinned_until = math.floor((time.time() + self.pin_seconds) * 1000) / 1000
+            response.set_cookie(
+                self.cookie_name,
+                f"{pinned_until:.3f}",
+                max_age=self.pin_seconds,
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
+
+    def _is_pinned(self, request) -> bool:
+        value = request.COOKIES.get(self.cookie_name)
+        if not value:
+            return False
+        try:
+            pinned_until = float(value)
+        except ValueError:
+            return False
+        # Не доверяем окну длиннее настроенного
+        now = time.time()
+        return now < pinned_until <= now + self.pin_seconds
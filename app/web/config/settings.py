@@ -13,6 +13,8 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 from pathlib import Path
 import os
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -48,6 +50,7 @@ MIDDLEWARE = [
     'django_prometheus.middleware.PrometheusBeforeMiddleware',
     "whitenoise.middleware.WhiteNoiseMiddleware",
     'django.middleware.security.SecurityMiddleware',
+    'config.middleware.ReadYourWritesMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -83,25 +86,72 @@ WSGI_APPLICATION = 'config.wsgi.application'
 db_user = os.getenv("POSTGRES_USERNAME")
 db_pass = os.getenv("POSTGRES_PASSWORD")
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.postgresql',
-        'NAME': 'postgres',
-        'USER': db_user,
-        'PASSWORD': db_pass,
-        'HOST': 'postgresql-cluster-master.postgres-operator.svc.cluster.local',  # имя сервиса мастера
-        'PORT': '5432',
-    },
-    'replica': {
+# Режим подключения к PostgreSQL:
+# - "persistent": постоянные соединения на воркер с проверкой перед повторным использованием;
+# - "pgbouncer": через внешний пулер в transaction-режиме (пулер Zalando-оператора).
+#   Серверные курсоры и подготовленные выражения отключаются — соединение
+#   между транзакциями может достаться другому клиенту.
+DB_CONNECTION_MODE = os.getenv("DB_CONNECTION_MODE", "persistent")
+DB_USE_PGBOUNCER = DB_CONNECTION_MODE == "pgbouncer"
+
+# Тип воркеров gunicorn (см. gunicorn_config.py): sync, gevent или ASGI через uvicorn
+GEVENT_WORKERS = os.getenv("GUNICORN_WORKER_CLASS") == "gevent"
+ASGI_WORKERS = os.getenv("GUNICORN_WORKER_CLASS") == "uvicorn.workers.UvicornWorker"
+
+# Асинхронные представления чтения (app/async_views.py); по умолчанию включены под ASGI
+ASYNC_VIEWS = os.getenv("ASYNC_VIEWS", "1" if ASGI_WORKERS else "0") == "1"
+
+if DB_USE_PGBOUNCER:
+    default_master_host = 'postgresql-cluster-pooler.postgres-operator.svc.cluster.local'  # пулер мастера
+    default_replica_hosts = 'postgresql-cluster-pooler-repl.postgres-operator.svc.cluster.local'  # пулер реплик
+else:
+    default_master_host = 'postgresql-cluster-master.postgres-operator.svc.cluster.local'  # имя сервиса мастера
+    default_replica_hosts = 'postgresql-cluster-repl.postgres-operator.svc.cluster.local'  # имя сервиса реплики
+
+
+def database_config(host: str) -> dict:
+    options = {'connect_timeout': 3}  # недоступный узел не должен вешать запрос
+    if DB_USE_PGBOUNCER:
+        options['prepare_threshold'] = None  # psycopg не готовит выражения на сервере
+
+    return {
         'ENGINE': 'django.db.backends.postgresql',
         'NAME': 'postgres',
         'USER': db_user,
         'PASSWORD': db_pass,
-        'HOST': 'postgresql-cluster-repl.postgres-operator.svc.cluster.local',  # имя сервиса реплики
+        'HOST': host,
         'PORT': '5432',
-    },
+        # Соединение живёт между запросами (в секундах); 0 — закрывать после каждого запроса
+        # (под gevent и ASGI соединения привязаны к гринлету/потоку запроса и не
+        # переиспользуются — там 0 и pgbouncer)
+        'CONN_MAX_AGE': int(os.getenv("DB_CONN_MAX_AGE", "0" if GEVENT_WORKERS or ASGI_WORKERS else "60")),
+        # Проверять соединение перед повторным использованием в новом запросе
+        'CONN_HEALTH_CHECKS': True,
+        'DISABLE_SERVER_SIDE_CURSORS': DB_USE_PGBOUNCER,
+        'OPTIONS': options,
+    }
+
+
+DATABASES = {
+    'default': database_config(os.getenv("POSTGRES_MASTER_HOST", default_master_host)),
 }
 
+# Реплики для чтения: "host=вес,host=вес". Первая получает алиас 'replica', остальные 'replica_N'.
+# По умолчанию — сервис реплик Zalando, балансирующий по всем репликам кластера.
+replica_hosts = os.getenv("POSTGRES_REPLICA_HOSTS", default_replica_hosts)
+
+DATABASE_REPLICAS = {}  # алиас -> вес при балансировке чтений
+for i, item in enumerate(h.strip() for h in replica_hosts.split(",") if h.strip()):
+    host, _, weight = item.partition("=")
+    alias = 'replica' if i == 0 else f'replica_{i}'
+    DATABASES[alias] = database_config(host)
+    DATABASE_REPLICAS[alias] = int(weight or 1)
+
+# Реплика с отставанием больше порога исключается из балансировки
+DB_REPLICA_MAX_LAG_SECONDS = float(os.getenv("DB_REPLICA_MAX_LAG_SECONDS", "10"))
+# Как часто (на процесс) проверять отставание реплик через pg_last_xact_replay_timestamp()
+DB_REPLICA_CHECK_INTERVAL_SECONDS = float(os.getenv("DB_REPLICA_CHECK_INTERVAL_SECONDS", "5"))
+
 
 
 # Password validation
@@ -226,6 +276,10 @@ STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
 
 DATABASE_ROUTERS = ['config.db_router.MasterReplicaRouter']
 
+# Read-your-writes: после записи чтения клиента идут в мастер указанное число секунд
+DB_READ_YOUR_WRITES_SECONDS = int(os.getenv("DB_READ_YOUR_WRITES_SECONDS", "5"))
+DB_PIN_COOKIE_NAME = "db_pin"
+
 
 DEFAULT_FILE_STORAGE = "storages.backends.s3boto3.S3Boto3Storage"
 
@@ -240,42 +294,242 @@ AWS_STORAGE_BUCKET_NAME = "content"
 AWS_S3_FILE_OVERWRITE = True
 AWS_QUERYSTRING_AUTH = False  # чтобы не было временных URL
 
+# Отдача текста заметки в NoteAPI.retrieve: "inline" — в поле content,
+# "presigned" — короткоживущей ссылкой content_url на MinIO (кроме burn_after_read)
+NOTE_CONTENT_DELIVERY = os.getenv("NOTE_CONTENT_DELIVERY", "inline")
+NOTE_PRESIGNED_URL_EXPIRES = int(os.getenv("NOTE_PRESIGNED_URL_EXPIRES", "60"))  # секунды
+# Сколько секунд общие кэши (ingress) могут отдавать публичную заметку без
+# перепроверки (не дольше её dead_line): правки и удаление видны с этой задержкой
+NOTE_PUBLIC_CACHE_MAX_AGE = int(os.getenv("NOTE_PUBLIC_CACHE_MAX_AGE", "300"))
+# Адрес MinIO, по которому клиенты скачивают по подписанным ссылкам
+MINIO_PUBLIC_ENDPOINT_URL = os.getenv("MINIO_PUBLIC_ENDPOINT_URL", AWS_S3_ENDPOINT_URL)
+
+# Двухфазная загрузка текста заметки напрямую в MinIO (POST /notes/uploads/)
+NOTE_UPLOAD_MAX_SIZE = int(os.getenv("NOTE_UPLOAD_MAX_SIZE", str(100 * 1024 * 1024)))  # байт
+NOTE_UPLOAD_PART_SIZE = int(os.getenv("NOTE_UPLOAD_PART_SIZE", str(8 * 1024 * 1024)))  # байт, не меньше 5 МиБ
+NOTE_UPLOAD_EXPIRES = int(os.getenv("NOTE_UPLOAD_EXPIRES", "3600"))  # секунды на загрузку и завершение
+
+# Сжатие текстов заметок в MinIO (util/note_codec.py): "none", "gzip" или "zstd".
+# Объекты помечаются кодировкой, так что смена кодека не ломает чтение старых.
+# При NOTE_CONTENT_DELIVERY="presigned" клиенты получают объект как есть —
+# совместимы только "none" и "gzip" (Content-Encoding: gzip).
+NOTE_STORAGE_CODEC = os.getenv("NOTE_STORAGE_CODEC", "none")
+if NOTE_STORAGE_CODEC not in ("none", "gzip", "zstd"):
+    raise ImproperlyConfigured(f"NOTE_STORAGE_CODEC: неизвестный кодек {NOTE_STORAGE_CODEC!r}")
+if NOTE_CONTENT_DELIVERY == "presigned" and NOTE_STORAGE_CODEC == "zstd":
+    raise ImproperlyConfigured(
+        "NOTE_STORAGE_CODEC=zstd несовместим с NOTE_CONTENT_DELIVERY=presigned: "
+        "клиенты скачивали бы сжатые объекты, которые не могут разжать"
+    )
+NOTE_COMPRESS_MIN_SIZE = int(os.getenv("NOTE_COMPRESS_MIN_SIZE", "64"))  # байт, короче — без сжатия
+# Словарь zstd для записи (dict_id из manage.py train_note_dict); 0 — сжимать без словаря.
+# Словари хранятся в MinIO, для чтения подгружается словарь из метки объекта
+NOTE_ZSTD_DICT_ID = int(os.getenv("NOTE_ZSTD_DICT_ID", "0"))
+NOTE_ZSTD_DICT_MAX_SIZE = int(os.getenv("NOTE_ZSTD_DICT_MAX_SIZE", str(16 * 1024)))  # байт, длиннее — без словаря
+
 
 MEILISEARCH_URL = "http://meilisearch.meili-system.svc.cluster.local:7700"
 MEILISEARCH_API_KEY = os.getenv("MEILI_MASTER_KEY")
 MEILISEARCH_INDEX_NAME = "notes"
 
 
+# Кодек значений read/write кэшей (util/cache_codec.py): сериализация и сжатие
+# крупных значений. Ключи разделены префиксом кодека, поэтому смена кодека
+# не ломает чтение записей, сделанных старым.
+CACHE_SERIALIZERS = {
+    "pickle": "django_redis.serializers.pickle.PickleSerializer",
+    "msgpack": "django_redis.serializers.msgpack.MSGPackSerializer",
+    "orjson": "util.cache_codec.OrjsonSerializer",
+}
+CACHE_COMPRESSORS = {
+    "none": "django_redis.compressors.identity.IdentityCompressor",
+    "zstd": "util.cache_codec.ThresholdZstdCompressor",
+    "lz4": "util.cache_codec.ThresholdLz4Compressor",
+}
+CACHE_SERIALIZER = os.getenv("CACHE_SERIALIZER", "msgpack")
+CACHE_COMPRESSOR = os.getenv("CACHE_COMPRESSOR", "zstd")
+CACHE_COMPRESS_MIN_LENGTH = int(os.getenv("CACHE_COMPRESS_MIN_LENGTH", "1024"))  # байт
+
+note_cache_options = {
+    "CLIENT_CLASS": "django_redis.client.DefaultClient",
+    "SERIALIZER": CACHE_SERIALIZERS[CACHE_SERIALIZER],
+    "COMPRESSOR": CACHE_COMPRESSORS[CACHE_COMPRESSOR],
+    "COMPRESS_MIN_LENGTH": CACHE_COMPRESS_MIN_LENGTH,
+}
+note_cache_prefix = f"{CACHE_SERIALIZER}-{CACHE_COMPRESSOR}"
+
+# Client-side caching для read_cache: каждый воркер держит локальную копию
+# прочитанных ключей (GET/MGET), а Redis по RESP3 CLIENT TRACKING присылает
+# инвалидацию, когда ключ меняется или удаляется через write_cache.
+# Асинхронные представления (AsyncCache) читают Redis напрямую.
+CACHE_CLIENT_TRACKING = os.getenv("CACHE_CLIENT_TRACKING", "0") == "1"
+CACHE_CLIENT_TRACKING_MAX_SIZE = int(os.getenv("CACHE_CLIENT_TRACKING_MAX_SIZE", "10000"))  # ключей на воркер
+
+# Шарды read/write кэшей (util/cache_shard.py): "имя=мастер|реплика,..." (реплика необязательна)
+# Ключи распределяются консистентным хешем по имени шарда; запись идёт в мастер
+# шарда, чтение — с его реплики. Один шард — обычный DefaultClient.
+# По умолчанию кэш живёт в отдельном Redis (my-redis-cache, allkeys-lru), а не в брокере Celery
+default_cache_shards = (
+    "main=redis://:your-strong-password@my-redis-cache-master.redis.svc.cluster.local:6379/0"
+    "|redis://:your-strong-password@my-redis-cache-replicas.redis.svc.cluster.local:6379/0"
+)
+
+
+def cache_shard(item: str) -> tuple[str, str, str]:
+    """Разбирает шард "имя=мастер|реплика"; без реплики чтение идёт с мастера."""
+    name, _, urls = item.partition("=")
+    master, _, replica = urls.partition("|")
+    if not name.strip() or not master.strip():
+        raise ImproperlyConfigured(f"CACHE_REDIS_SHARDS: ожидается 'имя=мастер[|реплика]', получено {item!r}")
+    return name.strip(), master.strip(), replica.strip() or master.strip()
+
+
+cache_shards = [
+    cache_shard(item) for item in os.getenv("CACHE_REDIS_SHARDS", default_cache_shards).split(",") if item.strip()
+]
+CACHE_SHARD_NAMES = [name for name, _, _ in cache_shards]
+cache_master_urls = [master for _, master, _ in cache_shards]
+cache_replica_urls = [replica for _, _, replica in cache_shards]
+
+# Собственный ограниченный пул соединений кэша на процесс (не общий с брокером Celery)
+CACHE_MAX_CONNECTIONS = int(os.getenv("CACHE_MAX_CONNECTIONS", "50"))
+cache_pool_kwargs = {
+    "max_connections": CACHE_MAX_CONNECTIONS,
+    "socket_connect_timeout": 1,
+    "socket_timeout": 1,
+}
+if len(cache_shards) > 1:
+    note_cache_options = {
+        **note_cache_options,
+        "CLIENT_CLASS": "util.cache_shard.ShardedClient",
+        "SHARD_NAMES": CACHE_SHARD_NAMES,
+    }
+
+write_cache_options = {**note_cache_options, "CONNECTION_POOL_KWARGS": cache_pool_kwargs}
+read_cache_options = {**note_cache_options, "CONNECTION_POOL_KWARGS": cache_pool_kwargs}
+if CACHE_CLIENT_TRACKING:
+    from redis.cache import CacheConfig
+
+    read_cache_options["CONNECTION_POOL_KWARGS"] = {
+        **cache_pool_kwargs,
+        "protocol": 3,
+        "cache_config": CacheConfig(max_size=CACHE_CLIENT_TRACKING_MAX_SIZE),
+    }
+
 CACHES = {
     "default": {
         "BACKEND": "django_redis.cache.RedisCache",
-        "LOCATION": "redis://:your-strong-password@my-redis-master.redis.svc.cluster.local:6379/0",
+        "LOCATION": os.getenv("CACHE_DEFAULT_URL", cache_master_urls[0]),
         "OPTIONS": {
             "CLIENT_CLASS": "django_redis.client.DefaultClient",
+            "CONNECTION_POOL_KWARGS": cache_pool_kwargs,
         }
     },
     "write_cache": {
         "BACKEND": "django_redis.cache.RedisCache",
-        "LOCATION": "redis://:your-strong-password@my-redis-master.redis.svc.cluster.local:6379/0",
+        "LOCATION": cache_master_urls,
+        "KEY_PREFIX": note_cache_prefix,
+        "OPTIONS": write_cache_options,
+    },
+    "read_cache": {
+        "BACKEND": "django_redis.cache.RedisCache",
+        "LOCATION": cache_replica_urls,
+        "KEY_PREFIX": note_cache_prefix,
+        "OPTIONS": read_cache_options,
+    },
+    # Сессии: Redis брокера (без вытеснения), а не кэш с allkeys-lru — иначе
+    # вытеснение ключа разлогинивало бы пользователя
+    "sessions": {
+        "BACKEND": "django_redis.cache.RedisCache",
+        "LOCATION": os.getenv(
+            "SESSION_REDIS_URL", "redis://:your-strong-password@my-redis-master.redis.svc.cluster.local:6379/2"
+        ),
         "OPTIONS": {
             "CLIENT_CLASS": "django_redis.client.DefaultClient",
+            "CONNECTION_POOL_KWARGS": cache_pool_kwargs,
         }
     },
-    "read_cache": {
+    # Состояние, которое нельзя терять при вытеснении: незавершённые загрузки,
+    # прогресс удаления аккаунтов, версии списков заметок (сброс версии вернул бы
+    # устаревшие страницы) и блокировки single-flight. Тот же Redis без вытеснения
+    "state": {
         "BACKEND": "django_redis.cache.RedisCache",
-        "LOCATION": "redis://:your-strong-password@my-redis-replicas.redis.svc.cluster.local:6379/0",
+        "LOCATION": os.getenv(
+            "STATE_REDIS_URL", "redis://:your-strong-password@my-redis-master.redis.svc.cluster.local:6379/3"
+        ),
         "OPTIONS": {
             "CLIENT_CLASS": "django_redis.client.DefaultClient",
+            "CONNECTION_POOL_KWARGS": cache_pool_kwargs,
         }
-    }
+    },
 }
 
+# Сессии в Redis вместо таблицы django_session: запрос с сессией не ходит в PostgreSQL.
+# "django.contrib.sessions.backends.cached_db" — чтение из Redis, запись и в БД
+SESSION_ENGINE = os.getenv("SESSION_ENGINE", "django.contrib.sessions.backends.cache")
+SESSION_CACHE_ALIAS = "sessions"
+
+# Пользователь сессии кэшируется (config/auth_backend.py) на столько секунд;
+# UpdateAccountView и DeleteAccountView сбрасывают запись сразу.
+# Второй бэкенд не нужен: сессии из django_session движок cache всё равно не читает,
+# а лишний ModelBackend удваивал бы проверку пароля при неудачном входе
+AUTHENTICATION_BACKENDS = ["config.auth_backend.CachedModelBackend"]
+USER_CACHE_TIMEOUT = int(os.getenv("USER_CACHE_TIMEOUT", "60"))
+
+
+# Redis как брокер (очереди задач; без вытеснения ключей)
+CELERY_BROKER_URL = os.getenv(
+    "CELERY_BROKER_URL", "redis://:your-strong-password@my-redis-master.redis.svc.cluster.local:6379/0"
+)
+CELERY_BROKER_POOL_LIMIT = int(os.getenv("CELERY_BROKER_POOL_LIMIT", "10"))
+
+# Результаты задач: задачи из сигналов запускаются «выстрелил и забыл»,
+# поэтому результаты не сохраняются, пока задача явно не попросит ignore_result=False.
+# Пустой CELERY_RESULT_BACKEND отключает бэкенд целиком.
+CELERY_RESULT_BACKEND = os.getenv(
+    "CELERY_RESULT_BACKEND", "redis://:your-strong-password@my-redis-master.redis.svc.cluster.local:6379/1"
+) or None
+CELERY_TASK_IGNORE_RESULT = True
+CELERY_RESULT_EXPIRES = 3600
+CELERY_REDIS_MAX_CONNECTIONS = int(os.getenv("CELERY_REDIS_MAX_CONNECTIONS", "10"))
+
+# Очереди: удаление данных (приватный путь) не должно ждать за всплеском индексации.
+# Каждую очередь обслуживает свой Deployment воркеров (celery/celery-worker-deployment.yaml),
+# масштабируемый KEDA по длине очереди (celery/celery-keda.yaml).
+CELERY_TASK_DEFAULT_QUEUE = "cleanup"
+CELERY_TASK_ROUTES = {
+    "tasks.base_tasks.delete_note_data": {"queue": "deletion"},
+    "tasks.base_tasks.update_note_data_if_changed": {"queue": "indexing"},
+    "tasks.base_tasks.update_meilisearch_document_if_public": {"queue": "indexing"},
+    "tasks.base_tasks.index_public_notes": {"queue": "indexing"},
+    "tasks.base_tasks.index_note": {"queue": "indexing"},
+    "tasks.base_tasks.delete_search_documents": {"queue": "indexing"},
+    "tasks.base_tasks.purge_account": {"queue": "deletion"},
+}
 
-# Redis как брокер
-CELERY_BROKER_URL = 'redis://:your-strong-password@my-redis-master.redis.svc.cluster.local:6379/0'
-
-# Результаты задач (можно временно не использовать)
-CELERY_RESULT_BACKEND = 'redis://:your-strong-password@my-redis-master.redis.svc.cluster.local:6379/1'
+# POST /notes/bulk/: максимум заметок в одном запросе и параллельных загрузок в MinIO
+NOTES_BULK_MAX_SIZE = int(os.getenv("NOTES_BULK_MAX_SIZE", "100"))
+NOTES_BULK_UPLOAD_WORKERS = int(os.getenv("NOTES_BULK_UPLOAD_WORKERS", "16"))
+
+# GET /notes/batch/: максимум заметок в одном запросе и параллельных чтений из MinIO
+NOTES_BATCH_MAX_SIZE = int(os.getenv("NOTES_BATCH_MAX_SIZE", "100"))
+NOTES_BATCH_READ_WORKERS = int(os.getenv("NOTES_BATCH_READ_WORKERS", "16"))
+
+# Сколько заметок пользователя (вместе с комментариями к ним) удалять за один запуск purge_account
+ACCOUNT_PURGE_CHUNK_SIZE = int(os.getenv("ACCOUNT_PURGE_CHUNK_SIZE", "500"))
+# Сколько секунд один запуск purge_account удаляет порции, прежде чем передать продолжение в очередь
+ACCOUNT_PURGE_TASK_SECONDS = int(os.getenv("ACCOUNT_PURGE_TASK_SECONDS", "60"))
+
+# Приоритеты внутри очереди (в Redis 0 — наивысший): 0 — срочные, 5 — обычные.
+# Каждый уровень — отдельный список "<очередь>:<приоритет>" (у 0 — просто "<очередь>").
+CELERY_TASK_DEFAULT_PRIORITY = 5
+CELERY_BROKER_TRANSPORT_OPTIONS = {
+    "queue_order_strategy": "priority",
+    "priority_steps": [0, 5],
+    "sep": ":",
+}
+# Воркер не забирает задачи впрок, иначе приоритет не успевает сработать
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
 
 # Таймзона
 CELERY_TIMEZONE = 'UTC'
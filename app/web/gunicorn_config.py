@@ -1,4 +1,21 @@
 import multiprocessing
+import os
+
+# Тип воркера: "sync" (по умолчанию), "gevent" или "uvicorn.workers.UvicornWorker" (ASGI
+# с асинхронными представлениями чтения) для большого числа одновременных запросов,
+# ожидающих Redis, PostgreSQL, MinIO и Meilisearch
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "sync")
+
+# Приложение: ASGI для uvicorn-воркеров, WSGI для остальных
+if worker_class == "uvicorn.workers.UvicornWorker":
+    wsgi_app = "config.asgi:application"
+else:
+    wsgi_app = "config.wsgi:application"
+
+if worker_class == "gevent":
+    # Патчим сокеты до preload_app, иначе redis/boto3/requests останутся блокирующими
+    from gevent import monkey
+    monkey.patch_all()
 
 # Биндим на все интерфейсы на порту 8000
 bind = "0.0.0.0:8000"
@@ -6,8 +23,8 @@ bind = "0.0.0.0:8000"
 # Количество воркеров = количество ядер * 2 + 1
 workers = multiprocessing.cpu_count() * 2 + 1
 
-# Тип воркера — стандартный синхронный
-worker_class = "sync"
+# Одновременных запросов на gevent-воркер
+worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", "200"))
 
 # Таймаут запроса
 timeout = 30
@@ -28,6 +45,11 @@ capture_output = True
 # Прелоад кода приложения (экономит память через copy-on-write)
 preload_app = True
 
+# Соединения с БД, открытые в мастере до fork, не должны разделяться воркерами
+def post_fork(server, worker):
+    from django.db import connections
+    connections.close_all()
+
 # Название приложения (не обязательно)
 proc_name = "drf-app"
 
@@ -1,11 +1,23 @@
 import json
 import logging
-from celery import shared_task
+import time
+from celery import Task, shared_task
 from django.conf import settings
-from botocore.exceptions import ClientError
+from django.db import connections, transaction
+from django.utils import timezone
 from meilisearch.errors import MeilisearchApiError
 
-from util.cache import wcache
+from app.models import CustomUser, Note
+from app.serializer import NoteSerializer
+from util.content_store import lock_note_contents
+from util.cache import (
+    wcache,
+    bump_note_list_version,
+    forget_account_deleted,
+    note_cache_key,
+    note_meta_cache_key,
+    set_account_deletion_progress,
+)
 from util.meilisearch import get_meilisearch_index
 from util.minio_client import get_minio_client
 
@@ -72,30 +84,25 @@ def get_cached_content(cache_key: str) -> str | None:
 
 
 # ----------- MinIO -----------
-def delete_from_minio(note_id: str) -> None:
+def delete_from_minio(note_id: str, content_key: str | None = None) -> None:
     """
-    Удаляет файл заметки из MinIO-хранилища.
+    Снимает ссылку удалённой заметки на файл в MinIO.
+
+    Файл удаляется, только если на него не ссылается ни одна другая заметка
+    (см. release_note_contents).
 
     :param note_id: Уникальный идентификатор заметки
+    :param content_key: Имя файла заметки (note.content.name); по умолчанию {note_id}.txt
     """
-    bucket_name = getattr(settings, "AWS_STORAGE_BUCKET_NAME", None)
-    file_name = f"{note_id}.txt"
-
-    if not bucket_name:
-        logger.error("[MinIO] AWS_STORAGE_BUCKET_NAME не задан в настройках.")
-        return
+    file_name = content_key or f"{note_id}.txt"
 
     try:
-        minio_client = get_minio_client()
-        minio_client.delete_object(Bucket=bucket_name, Key=file_name)
-        logger.info(f"[MinIO] Файл {file_name} удалён из хранилища.")
-    except ClientError as e:
-        if e.response.get("Error", {}).get("Code") == "NoSuchKey":
-            logger.warning(f"[MinIO] Файл {file_name} не найден.")
+        if release_note_contents([file_name]):
+            logger.info(f"[MinIO] Файл {file_name} удалён из хранилища.")
         else:
-            logger.exception(f"[MinIO] Ошибка при удалении {file_name}: {e}")
+            logger.info(f"[MinIO] Файл {file_name} используется другими заметками — оставлен.")
     except Exception as e:
-        logger.exception(f"[MinIO] Неизвестная ошибка при удалении {file_name}: {e}")
+        logger.exception(f"[MinIO] Ошибка при удалении {file_name}: {e}")
 
 
 # ----------- Meilisearch -----------
@@ -156,7 +163,7 @@ def delete_from_meilisearch(note_id: str) -> None:
         logger.exception(f"[Meilisearch] Ошибка при удалении документа {note_id}: {e}")
 
 
-@shared_task
+@shared_task(ignore_result=True)
 def update_meilisearch_document_if_public(serialized_note: dict) -> None:
     """
     Добавляет или удаляет документ из Meilisearch в зависимости от публичности.
@@ -193,23 +200,66 @@ def update_meilisearch_document_if_public(serialized_note: dict) -> None:
 
 
 # ----------- Celery задачи -----------
-@shared_task
-def delete_note_data(note_id: str) -> None:
+@shared_task(ignore_result=True)
+def index_note(note_id: str) -> None:
+    """
+    Индексирует заметку по ID, читая текст в воркере Celery.
+
+    Используется для заметок, загруженных напрямую в MinIO: текст не проходит
+    через веб-воркер и не передаётся через брокер.
+
+    :param note_id: Идентификатор заметки
+    """
+    note = Note.objects.using("default").filter(note_id=note_id).first()
+    if note is None:
+        logger.warning(f"[Meilisearch] Заметка {note_id} не найдена для индексации.")
+        return
+    update_meilisearch_document_if_public(NoteSerializer(note).data)
+
+
+@shared_task(ignore_result=True)
+def index_public_notes(serialized_notes: list[dict]) -> None:
+    """
+    Добавляет пачку публичных заметок в Meilisearch одной задачей индекса.
+
+    :param serialized_notes: Сериализованные заметки (непубличные пропускаются)
+    """
+    docs = [
+        {"id": note["note_id"], "content": note.get("content", "")}
+        for note in serialized_notes
+        if note.get("is_public")
+    ]
+    if not docs:
+        return
+
+    try:
+        index = get_meilisearch_index()
+        task = index.add_documents(docs)
+        index.wait_for_task(task.task_uid)
+        logger.info(f"[Meilisearch] Добавлено документов: {len(docs)}.")
+    except Exception as e:
+        logger.exception(f"[Meilisearch] Ошибка при пакетном добавлении документов: {e}")
+
+
+@shared_task(ignore_result=True)
+def delete_note_data(note_id: str, content_key: str | None = None) -> None:
     """
     Удаляет все связанные с заметкой данные:
     - из Redis (ключ note:{note_id})
-    - из MinIO ({note_id}.txt)
+    - из MinIO (файл текста, если на него больше никто не ссылается)
     - из Meilisearch
 
     :param note_id: Уникальный идентификатор заметки
+    :param content_key: Имя файла заметки; по умолчанию {note_id}.txt
     """
     cache_key = f"note:{note_id}"
     delete_from_cache(cache_key)
-    delete_from_minio(note_id)
+    delete_from_cache(note_meta_cache_key(note_id))
+    delete_from_minio(note_id, content_key)
     delete_from_meilisearch(note_id)
 
 
-@shared_task
+@shared_task(ignore_result=True)
 def update_note_data_if_changed(note_id: str, serialized_note: dict) -> None:
     """
     Проверяет и обновляет данные заметки, #если изменился её контент.
@@ -234,6 +284,190 @@ def update_note_data_if_changed(note_id: str, serialized_note: dict) -> None:
 
     if cached_content is not None:
         delete_from_cache(cache_key)
+    delete_from_cache(note_meta_cache_key(note_id))
 
     update_meilisearch_document_if_public(serialized_note)
     logger.info(f"[Update] Заметка {note_id} обновлена.")
+
+
+# ----------- Удаление аккаунта -----------
+# Лимит ключей в одном DeleteObjects (S3/MinIO)
+MINIO_DELETE_BATCH_SIZE = 1000
+
+# Заметки порции вместе со всеми комментариями к ним (и комментариями к комментариям)
+NOTE_TREE_SQL = """
+WITH RECURSIVE tree AS (
+    SELECT note_id, user_id, content FROM note WHERE note_id = ANY(%s)
+    UNION
+    SELECT n.note_id, n.user_id, n.content FROM note n JOIN tree t ON n.to_comment_id = t.note_id
+)
+SELECT note_id, user_id, content FROM tree
+"""
+
+
+def collect_note_tree(note_ids: list[str]) -> list[tuple[str, str, str]]:
+    """
+    Возвращает (note_id, user_id, content) заметок и всех их комментариев одним рекурсивным запросом к мастеру.
+    """
+    with connections["default"].cursor() as cursor:
+        cursor.execute(NOTE_TREE_SQL, [note_ids])
+        return cursor.fetchall()
+
+
+def delete_many_from_minio(keys: list[str]) -> None:
+    """
+    Удаляет файлы из MinIO пачками DeleteObjects, не проверяя ссылки на них.
+
+    :param keys: Имена файлов
+    """
+    bucket_name = settings.AWS_STORAGE_BUCKET_NAME
+    minio_client = get_minio_client()
+
+    for start in range(0, len(keys), MINIO_DELETE_BATCH_SIZE):
+        batch = keys[start:start + MINIO_DELETE_BATCH_SIZE]
+        response = minio_client.delete_objects(
+            Bucket=bucket_name,
+            Delete={"Objects": [{"Key": key} for key in batch], "Quiet": True},
+        )
+        errors = [error for error in response.get("Errors", []) if error.get("Code") != "NoSuchKey"]
+        if errors:
+            raise RuntimeError(f"[MinIO] Не удалось удалить {len(errors)} файлов, например {errors[0]}")
+        logger.info(f"[MinIO] Удалено файлов: {len(batch)}.")
+
+
+@shared_task(ignore_result=True)
+def release_note_contents(keys: list[str]) -> int:
+    """
+    Удаляет из MinIO файлы текстов, на которые не ссылается ни одна заметка.
+
+    Ссылки считаются по строкам Note в мастере под advisory-блокировками ключей
+    (util.content_store), которые держит и создание заметок, поэтому файл
+    не удаляется, пока параллельно вставляется заметка с тем же текстом.
+    Вызванная внутри транзакции, видит её собственные удаления строк.
+
+    :param keys: Имена файлов, ссылки на которые могли пропасть
+    :return: Сколько файлов удалено
+    """
+    keys = sorted(set(key for key in keys if key))
+    if not keys:
+        return 0
+
+    with transaction.atomic(using="default"):
+        lock_note_contents(keys)
+        referenced = set(
+            Note.objects.using("default").filter(content__in=keys)
+            .order_by().values_list("content", flat=True).distinct()
+        )
+        orphaned = [key for key in keys if key not in referenced]
+        delete_many_from_minio(orphaned)
+    return len(orphaned)
+
+
+def delete_many_from_meilisearch(note_ids: list[str]) -> None:
+    """
+    Удаляет документы заметок из Meilisearch одной задачей индекса.
+
+    :param note_ids: Идентификаторы заметок
+    """
+    index = get_meilisearch_index()
+    task = index.delete_documents(note_ids)
+    index.wait_for_task(task.task_uid)
+    logger.info(f"[Meilisearch] Удалено документов: {len(note_ids)}.")
+
+
+@shared_task(ignore_result=True, autoretry_for=(Exception,), retry_backoff=True, max_retries=10)
+def delete_search_documents(note_ids: list[str]) -> None:
+    """
+    Удаляет документы из Meilisearch с повторами — для удалений, не прошедших сразу.
+
+    :param note_ids: Идентификаторы заметок
+    """
+    delete_many_from_meilisearch(note_ids)
+
+
+def purge_note_chunk(user_id: str, chunk: list[str]) -> int:
+    """
+    Удаляет порцию заметок пользователя вместе с комментариями к ним.
+
+    Строки удаляются одним DELETE, а файлы, оставшиеся без ссылок, — из MinIO
+    пачками в той же транзакции (при ошибке MinIO строки не удаляются и порция
+    повторяется). Затем ключи удаляются из кэша, документы — из Meilisearch
+    одной задачей; недоступный Meilisearch не останавливает удаление аккаунта —
+    документы дочищает delete_search_documents.
+
+    :return: Сколько заметок удалено
+    """
+    tree = collect_note_tree(chunk)
+    note_ids = [note_id for note_id, _, _ in tree]
+
+    with transaction.atomic(using="default"):
+        with connections["default"].cursor() as cursor:
+            cursor.execute("DELETE FROM note WHERE note_id = ANY(%s)", [note_ids])
+        release_note_contents([content for _, _, content in tree])
+
+    wcache().delete_many(
+        [note_cache_key(note_id) for note_id in note_ids] + [note_meta_cache_key(note_id) for note_id in note_ids]
+    )
+
+    try:
+        delete_many_from_meilisearch(note_ids)
+    except Exception as e:
+        logger.warning(f"[Meilisearch] Не удалось удалить документы порции ({e}) — повторим в фоне.")
+        delete_search_documents.delay(note_ids)
+
+    # Комментарии других пользователей тоже удалены — их списки заметок устарели
+    for owner_id in {owner_id for _, owner_id, _ in tree if owner_id != user_id}:
+        bump_note_list_version(owner_id)
+
+    return len(note_ids)
+
+
+class PurgeAccountTask(Task):
+    """Отмечает удаление аккаунта как failed, когда повторы purge_account исчерпаны."""
+
+    def on_failure(self, exc, task_id, args, kwargs, einfo):
+        user_id, job_id, *rest = args
+        deleted_notes = rest[0] if rest else kwargs.get("deleted_notes", 0)
+        set_account_deletion_progress(job_id, "failed", deleted_notes)
+        logger.error(f"[Account] Удаление аккаунта {user_id} ({job_id}) не удалось: {exc}")
+
+
+@shared_task(base=PurgeAccountTask, ignore_result=True, autoretry_for=(Exception,), retry_backoff=True, max_retries=5)
+def purge_account(user_id: str, job_id: str, deleted_notes: int = 0) -> None:
+    """
+    Удаляет данные аккаунта порциями без ORM-каскада и сигналов на каждую заметку.
+
+    Порции по ACCOUNT_PURGE_CHUNK_SIZE заметок обрабатываются, пока не истечёт
+    ACCOUNT_PURGE_TASK_SECONDS; затем задача ставит себя в очередь с продолжением.
+    Когда заметок не осталось, удаляется сам пользователь и снимается отметка
+    mark_account_deleted, которой DeleteAccountView скрыл заметки. Первый запуск
+    ещё и истекает dead_line всех заметок одним UPDATE — для выборок, которые
+    отметку не проверяют (случайная заметка, поиск).
+    Прогресс доступен по job_id (account_deletion_key); после исчерпания
+    повторов статус становится failed (PurgeAccountTask.on_failure).
+
+    :param user_id: Идентификатор удаляемого пользователя
+    :param job_id: Идентификатор задачи удаления для отчёта о прогрессе
+    :param deleted_notes: Сколько заметок уже удалено предыдущими запусками
+    """
+    notes = Note.objects.using("default").filter(user_id=user_id)
+    if not deleted_notes:
+        notes.update(dead_line=timezone.now())
+    deadline = time.monotonic() + settings.ACCOUNT_PURGE_TASK_SECONDS
+    while True:
+        chunk = list(notes.order_by().values_list("note_id", flat=True)[:settings.ACCOUNT_PURGE_CHUNK_SIZE])
+        if not chunk:
+            break
+
+        deleted_notes += purge_note_chunk(user_id, chunk)
+        set_account_deletion_progress(job_id, "in_progress", deleted_notes)
+        logger.info(f"[Account] Аккаунт {user_id}: удалено заметок {deleted_notes}.")
+
+        if time.monotonic() >= deadline:
+            purge_account.apply_async((user_id, job_id, deleted_notes))
+            return
+
+    CustomUser.objects.using("default").filter(pk=user_id).delete()
+    forget_account_deleted(user_id)
+    set_account_deletion_progress(job_id, "done", deleted_notes)
+    logger.info(f"[Account] Аккаунт {user_id} удалён, заметок: {deleted_notes}.")
@@ -1,4 +1,411 @@
+import asyncio
+import hashlib
+import logging
+import random
+import time
+import weakref
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Iterable
+
+import redis.asyncio as aioredis
+from django.conf import settings
 from django.core.cache import caches
+from django.utils import timezone
+
+from util.cache_shard import ShardRing, shard_names
+
+logger = logging.getLogger("myapp")
 
 wcache = lambda: caches["write_cache"]
 rcache = lambda: caches["read_cache"]
+# Redis без вытеснения для состояния, которое не пересобрать из БД (см. CACHES["state"])
+scache = lambda: caches["state"]
+
+
+# ----------- Асинхронный доступ к кэшу -----------
+class AsyncCache:
+    """
+    Асинхронный клиент к тем же Redis, что и django-redis кэш `alias`.
+
+    Ключи, сериализация и выбор шарда берутся у django-redis, поэтому записи
+    взаимозаменяемы с wcache()/rcache().
+    """
+
+    # Пулы redis.asyncio привязаны к event loop, поэтому клиенты храним по циклу
+    _clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict[str, aioredis.Redis]]" = (
+        weakref.WeakKeyDictionary()
+    )
+
+    def __init__(self, alias: str):
+        self.alias = alias
+        self.backend = caches[alias].client
+        self.servers = list(self.backend._server)
+        self.ring = ShardRing(shard_names(self.servers, self.backend._options)) if len(self.servers) > 1 else None
+
+    def redis(self, key: str) -> aioredis.Redis:
+        url = self.servers[self.ring.index(str(key)) if self.ring else 0]
+        clients = self._clients.setdefault(asyncio.get_running_loop(), {})
+        if url not in clients:
+            clients[url] = aioredis.Redis.from_url(url)
+        return clients[url]
+
+    def _by_shard(self, keys: Iterable[str]) -> list[tuple[aioredis.Redis, list[str]]]:
+        shards: dict[int, tuple[aioredis.Redis, list[str]]] = {}
+        for key in keys:
+            client = self.redis(self.backend.make_key(key))
+            shards.setdefault(id(client), (client, []))[1].append(key)
+        return list(shards.values())
+
+    async def get(self, key: str, default: Any = None) -> Any:
+        key = self.backend.make_key(key)
+        value = await self.redis(key).get(key)
+        return default if value is None else self.backend.decode(value)
+
+    async def set(self, key: str, value: Any, timeout: int) -> None:
+        key = self.backend.make_key(key)
+        await self.redis(key).set(key, self.backend.encode(value), ex=timeout)
+
+    async def get_many(self, keys: list[str]) -> dict[str, Any]:
+        """MGET по шардам: возвращает только найденные ключи, как cache.get_many()."""
+        found = {}
+        for client, shard_keys in self._by_shard(keys):
+            values = await client.mget([self.backend.make_key(key) for key in shard_keys])
+            found.update({key: self.backend.decode(value) for key, value in zip(shard_keys, values) if value is not None})
+        return found
+
+    async def set_many(self, data: dict[str, Any], timeout: int) -> None:
+        """Пакетная запись с TTL: один pipeline на шард."""
+        for client, shard_keys in self._by_shard(data):
+            async with client.pipeline(transaction=False) as pipe:
+                for key in shard_keys:
+                    pipe.set(self.backend.make_key(key), self.backend.encode(data[key]), ex=timeout)
+                await pipe.execute()
+
+    async def add(self, key: str, value: Any, timeout: int) -> bool:
+        """SET NX: записывает значение, только если ключа нет."""
+        key = self.backend.make_key(key)
+        return bool(await self.redis(key).set(key, self.backend.encode(value), ex=timeout, nx=True))
+
+    async def delete(self, key: str) -> None:
+        key = self.backend.make_key(key)
+        await self.redis(key).delete(key)
+
+
+async_wcache = lambda: AsyncCache("write_cache")
+async_rcache = lambda: AsyncCache("read_cache")
+async_scache = lambda: AsyncCache("state")
+
+
+# Время жизни закэшированной заметки note:{id} (секунды)
+NOTE_CACHE_TIMEOUT = 600
+
+# Максимальное время жизни закэшированного списка заметок пользователя (секунды)
+NOTE_LIST_CACHE_TIMEOUT = 300
+
+# Случайная добавка к TTL (доля), чтобы записи, созданные одновременно, не истекали разом
+CACHE_TIMEOUT_JITTER = 0.1
+
+# Single-flight: сколько живёт блокировка пересборки и сколько ждут остальные запросы
+SINGLE_FLIGHT_LOCK_TIMEOUT = 10
+SINGLE_FLIGHT_WAIT = 2.0
+SINGLE_FLIGHT_POLL_INTERVAL = 0.05
+
+
+# Сколько помнить, что заметки нет (не существует, истекла или сожжена)
+NOTE_MISSING_CACHE_TIMEOUT = 60
+
+
+def jittered_timeout(timeout: int) -> int:
+    return timeout + random.randint(0, int(timeout * CACHE_TIMEOUT_JITTER))
+
+
+# ----------- Пакетное чтение заметок -----------
+def note_cache_key(note_id: str) -> str:
+    return f"note:{note_id}"
+
+
+def note_meta_cache_key(note_id: str) -> str:
+    """Ключ метаданных заметки без текста (NOTE_CONTENT_DELIVERY = "presigned")."""
+    return f"note:meta:{note_id}"
+
+
+def note_upload_key(note_id: str) -> str:
+    """Ключ незавершённой загрузки текста заметки напрямую в MinIO (в scache)."""
+    return f"note:upload:{note_id}"
+
+
+def cached_notes_data(notes: list, serialize: Callable[[Any], dict]) -> list[dict]:
+    """
+    Возвращает сериализованные заметки страницы, читая кэш note:{id} одним MGET.
+
+    Промахи сериализуются через `serialize` (с чтением тела из MinIO) и
+    записываются обратно одним pipeline с TTL. Заметки burn_after_read
+    в кэш не попадают, как и в NoteAPI.retrieve. Заметки удаляемых
+    аккаунтов (deleted_owners) из страницы выпадают.
+    """
+    deleted = deleted_owners(note.user_id for note in notes)
+    notes = [note for note in notes if note.user_id not in deleted]
+    keys = [note_cache_key(note.note_id) for note in notes]
+    found = rcache().get_many(keys) if keys else {}
+
+    result, missing = [], {}
+    for note, key in zip(notes, keys):
+        data = found.get(key)
+        if data is None:
+            data = serialize(note)
+            if not note.burn_after_read:
+                missing[key] = data
+        result.append(data)
+
+    if missing:
+        wcache().set_many(missing, timeout=jittered_timeout(NOTE_CACHE_TIMEOUT))
+    logger.debug(f"[Cache] Заметки страницы: {len(found)} из кэша, {len(result) - len(found)} из БД/MinIO.")
+    return result
+
+
+async def acached_notes_data(notes: list, serialize: Callable[[Any], Awaitable[dict]]) -> list[dict]:
+    """Асинхронный вариант cached_notes_data; промахи сериализуются параллельно."""
+    deleted = await adeleted_owners(note.user_id for note in notes)
+    notes = [note for note in notes if note.user_id not in deleted]
+    keys = [note_cache_key(note.note_id) for note in notes]
+    found = await async_rcache().get_many(keys) if keys else {}
+
+    misses = [(note, key) for note, key in zip(notes, keys) if key not in found]
+    serialized = await asyncio.gather(*(serialize(note) for note, _ in misses))
+    found.update({key: data for (_, key), data in zip(misses, serialized)})
+
+    to_store = {key: data for (note, key), data in zip(misses, serialized) if not note.burn_after_read}
+    if to_store:
+        await async_wcache().set_many(to_store, timeout=jittered_timeout(NOTE_CACHE_TIMEOUT))
+    return [found[key] for key in keys]
+
+
+# ----------- Негативный кэш заметок -----------
+def missing_note_key(note_id: str) -> str:
+    return f"note:missing:{note_id}"
+
+
+def forget_missing_note(note_id: str) -> None:
+    """Снимает отметку об отсутствии заметки (например, если её ID занят новой заметкой)."""
+    try:
+        wcache().delete(missing_note_key(note_id))
+    except Exception as e:
+        logger.warning(f"[Cache] Не удалось снять отметку об отсутствии заметки {note_id}: {e}")
+
+
+def forget_missing_notes(note_ids: list[str]) -> None:
+    """Пакетный вариант forget_missing_note для заметок, созданных пачкой."""
+    try:
+        wcache().delete_many([missing_note_key(note_id) for note_id in note_ids])
+    except Exception as e:
+        logger.warning(f"[Cache] Не удалось снять отметки об отсутствии заметок: {e}")
+
+
+# ----------- Прогресс удаления аккаунта -----------
+# Сколько хранить прогресс задачи удаления аккаунта (секунды)
+ACCOUNT_DELETION_PROGRESS_TIMEOUT = 24 * 60 * 60
+
+
+def account_deletion_key(job_id: str) -> str:
+    return f"account:deletion:{job_id}"
+
+
+def set_account_deletion_progress(job_id: str, status: str, deleted_notes: int) -> None:
+    scache().set(
+        account_deletion_key(job_id),
+        {"status": status, "deleted_notes": deleted_notes},
+        timeout=ACCOUNT_DELETION_PROGRESS_TIMEOUT,
+    )
+
+
+def get_account_deletion_progress(job_id: str) -> dict | None:
+    return scache().get(account_deletion_key(job_id))
+
+
+# ----------- Удаляемые аккаунты -----------
+def account_deleted_key(user_id: str) -> str:
+    return f"account:deleted:{user_id}"
+
+
+def mark_account_deleted(user_id: str) -> None:
+    """
+    Скрывает все заметки аккаунта одной записью, не перебирая их.
+
+    Отметка живёт в scache без TTL до конца purge_account: пока она есть,
+    заметки владельца не отдаются ни из кэша, ни из БД (deleted_owners).
+    """
+    scache().set(account_deleted_key(user_id), 1, timeout=None)
+
+
+def forget_account_deleted(user_id: str) -> None:
+    scache().delete(account_deleted_key(user_id))
+
+
+def deleted_owners(user_ids: Iterable[str]) -> set[str]:
+    """Владельцы из user_ids, чьи аккаунты удаляются (один MGET)."""
+    keys = {account_deleted_key(user_id): user_id for user_id in set(user_ids)}
+    found = scache().get_many(list(keys)) if keys else {}
+    return {keys[key] for key in found}
+
+
+async def adeleted_owners(user_ids: Iterable[str]) -> set[str]:
+    """Асинхронный вариант deleted_owners."""
+    keys = {account_deleted_key(user_id): user_id for user_id in set(user_ids)}
+    found = await async_scache().get_many(list(keys)) if keys else {}
+    return {keys[key] for key in found}
+
+
+# ----------- Пользователь сессии -----------
+# Объект модели хранится в кэше "default" (pickle), а не в wcache (msgpack)
+def user_cache_key(user_id: str) -> str:
+    return f"user:{user_id}"
+
+
+def get_cached_user(user_id: str) -> Any:
+    return caches["default"].get(user_cache_key(user_id))
+
+
+def cache_user(user: Any) -> None:
+    caches["default"].set(user_cache_key(user.pk), user, timeout=settings.USER_CACHE_TIMEOUT)
+
+
+def forget_cached_user(user_id: str) -> None:
+    """Сбрасывает пользователя из кэша после изменения или отключения аккаунта."""
+    caches["default"].delete(user_cache_key(user_id))
+
+
+# ----------- Single-flight пересборка записей -----------
+# Значение fetch_single_flight, когда вместо записи найдена отметка missing_key
+MISSING = object()
+
+
+def _single_flight_hit(found: dict, key: str, missing_key: str | None) -> Any:
+    if missing_key is not None and missing_key in found:
+        return MISSING
+    return found.get(key)
+
+
+def fetch_single_flight(
+    key: str, build: Callable[[], tuple[Any, int | None]], missing_key: str | None = None
+) -> tuple[Any, bool]:
+    """
+    Возвращает значение по ключу, пересобирая его не более чем в одном запросе одновременно.
+
+    Первый промахнувшийся запрос берёт короткую блокировку в Redis и вызывает
+    `build()`, который возвращает (значение, TTL или None — не кэшировать).
+    Блокировка живёт в scache, чтобы её не вытеснили посреди пересборки.
+    Остальные ждут появления записи; если запись не появилась, а блокировка
+    освобождена (например, значение не кэшируется), они пересобирают сами.
+    Если `build()` вместо записи ставит отметку `missing_key` (негативный кэш),
+    ожидающие видят её и получают MISSING, не пересобирая сами.
+
+    :return: Кортеж (значение или MISSING, взято ли из кэша)
+    """
+    cache, locks = wcache(), scache()
+    lock_key = f"lock:{key}"
+    keys = [key] if missing_key is None else [key, missing_key]
+    deadline = time.monotonic() + SINGLE_FLIGHT_WAIT
+
+    while True:
+        if locks.add(lock_key, 1, timeout=SINGLE_FLIGHT_LOCK_TIMEOUT):
+            try:
+                # Запись могла появиться, пока мы ждали блокировку
+                value = _single_flight_hit(cache.get_many(keys), key, missing_key)
+                if value is not None:
+                    return value, True
+
+                value, timeout = build()
+                if timeout:
+                    cache.set(key, value, timeout=jittered_timeout(timeout))
+                return value, False
+            finally:
+                locks.delete(lock_key)
+
+        if time.monotonic() >= deadline:
+            logger.warning(f"[Cache] Не дождались пересборки {key} — собираем без блокировки.")
+            return build()[0], False
+
+        time.sleep(SINGLE_FLIGHT_POLL_INTERVAL)
+        value = _single_flight_hit(cache.get_many(keys), key, missing_key)
+        if value is not None:
+            return value, True
+
+
+async def afetch_single_flight(
+    key: str, build: Callable[[], Awaitable[tuple[Any, int | None]]], missing_key: str | None = None
+) -> tuple[Any, bool]:
+    """Асинхронный вариант fetch_single_flight для async-представлений."""
+    cache, locks = async_wcache(), async_scache()
+    lock_key = f"lock:{key}"
+    keys = [key] if missing_key is None else [key, missing_key]
+    deadline = time.monotonic() + SINGLE_FLIGHT_WAIT
+
+    while True:
+        if await locks.add(lock_key, 1, timeout=SINGLE_FLIGHT_LOCK_TIMEOUT):
+            try:
+                value = _single_flight_hit(await cache.get_many(keys), key, missing_key)
+                if value is not None:
+                    return value, True
+
+                value, timeout = await build()
+                if timeout:
+                    await cache.set(key, value, timeout=jittered_timeout(timeout))
+                return value, False
+            finally:
+                await locks.delete(lock_key)
+
+        if time.monotonic() >= deadline:
+            logger.warning(f"[Cache] Не дождались пересборки {key} — собираем без блокировки.")
+            return (await build())[0], False
+
+        await asyncio.sleep(SINGLE_FLIGHT_POLL_INTERVAL)
+        value = _single_flight_hit(await cache.get_many(keys), key, missing_key)
+        if value is not None:
+            return value, True
+
+
+# ----------- Список заметок пользователя -----------
+def note_list_version_key(user_id: str) -> str:
+    return f"notes:list:version:{user_id}"
+
+
+def get_note_list_version(user_id: str) -> int:
+    """
+    Возвращает текущую версию списка заметок пользователя.
+
+    Версия хранится в Redis без вытеснения (scache): вытесненная версия
+    начиналась бы заново и совпала бы с ключами старых страниц.
+    """
+    return scache().get(note_list_version_key(user_id), 0)
+
+
+def bump_note_list_version(user_id: str) -> None:
+    """
+    Инвалидирует все закэшированные страницы списка заметок пользователя,
+    увеличивая версию (атомарный INCRBY, ключ создаётся при отсутствии).
+    """
+    try:
+        scache().incr(note_list_version_key(user_id), ignore_key_check=True)
+    except Exception as e:
+        logger.warning(f"[Cache] Не удалось обновить версию списка заметок {user_id}: {e}")
+
+
+def note_list_cache_key(user_id: str, version: int, params: Iterable[tuple[str, str]]) -> str:
+    """
+    Формирует ключ страницы списка заметок с учётом версии и query-параметров.
+    """
+    raw_params = "&".join(f"{k}={v}" for k, v in sorted(params))
+    params_hash = hashlib.md5(raw_params.encode("utf-8")).hexdigest()
+    return f"notes:list:{user_id}:{version}:{params_hash}"
+
+
+def note_list_cache_timeout(dead_lines: Iterable[datetime]) -> int:
+    """
+    Время жизни страницы: не дольше NOTE_LIST_CACHE_TIMEOUT
+    и не дольше самого раннего dead_line среди заметок на странице.
+    """
+    timeout = NOTE_LIST_CACHE_TIMEOUT
+    earliest = min(dead_lines, default=None)
+    if earliest is not None:
+        timeout = min(timeout, int((earliest - timezone.now()).total_seconds()))
+    return max(timeout, 0)
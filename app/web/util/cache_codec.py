@@ -0,0 +1,36 @@
+"""
+Кодеки значений для django-redis кэшей (OPTIONS SERIALIZER/COMPRESSOR в settings.CACHES).
+
+Компрессоры сжимают только значения длиннее COMPRESS_MIN_LENGTH байт; при чтении
+несжатые значения распознаются и возвращаются как есть.
+"""
+from typing import Any
+
+import orjson
+from django_redis.compressors.lz4 import Lz4Compressor
+from django_redis.compressors.zstd import ZStdCompressor
+from django_redis.serializers.base import BaseSerializer
+
+# Порог сжатия по умолчанию (байт): мелкие записи сжатие только замедляет
+DEFAULT_COMPRESS_MIN_LENGTH = 1024
+
+
+class OrjsonSerializer(BaseSerializer):
+    def dumps(self, value: Any) -> bytes:
+        return orjson.dumps(value)
+
+    def loads(self, value: bytes) -> Any:
+        return orjson.loads(value)
+
+
+class ThresholdZstdCompressor(ZStdCompressor):
+    def __init__(self, options):
+        super().__init__(options)
+        self.min_length = int(options.get("COMPRESS_MIN_LENGTH", DEFAULT_COMPRESS_MIN_LENGTH))
+
+
+class ThresholdLz4Compressor(Lz4Compressor):
+    def __init__(self, options):
+        super().__init__(options)
+        self.min_length = int(options.get("COMPRESS_MIN_LENGTH", DEFAULT_COMPRESS_MIN_LENGTH))
+
@@ -0,0 +1,307 @@
+"""
+Шардирование read/write кэшей по нескольким Redis (OPTIONS CLIENT_CLASS в settings.CACHES).
+
+LOCATION — список серверов, по одному на шард: мастера у write_cache, реплики
+у read_cache. Ключ отправляется в шард по консистентному хешу от имени шарда
+(OPTIONS SHARD_NAMES), а не от URL, поэтому запись в мастер и чтение с реплики
+одного шарда видят один и тот же ключ.
+"""
+import bisect
+import hashlib
+import sys
+from collections import OrderedDict, defaultdict
+from typing import Any, Iterable
+
+from django_redis.client import DefaultClient
+from django_redis.client.default import DEFAULT_TIMEOUT
+
+# Виртуальных узлов на шард: чем больше, тем равномернее распределение ключей
+RING_REPLICAS = 128
+
+
+class ShardRing:
+    """Консистентный хеш: имя ключа -> индекс шарда."""
+
+    def __init__(self, names: list[str], replicas: int = RING_REPLICAS):
+        points = sorted(
+            (self._hash(f"{name}:{i}"), index)
+            for index, name in enumerate(names)
+            for i in range(replicas)
+        )
+        self._hashes = [point for point, _ in points]
+        self._indexes = [index for _, index in points]
+
+    @staticmethod
+    def _hash(value: str) -> int:
+        return int.from_bytes(hashlib.md5(value.encode("utf-8")).digest()[:8], "big")
+
+    def index(self, key: str) -> int:
+        position = bisect.bisect(self._hashes, self._hash(key)) % len(self._hashes)
+        return self._indexes[position]
+
+
+class ShardRoutingError(Exception):
+    """Команда кэша не может быть выполнена в одном шарде (ключ неизвестен или ключи в разных шардах)."""
+
+
+def shard_names(servers: list[str], options: dict) -> list[str]:
+    names = options.get("SHARD_NAMES") or [f"shard-{i}" for i in range(len(servers))]
+    if len(names) != len(servers):
+        raise ValueError("SHARD_NAMES должен содержать по имени на каждый сервер LOCATION")
+    return list(names)
+
+
+class ShardedClient(DefaultClient):
+    """
+    django-redis клиент, раскладывающий ключи по шардам.
+
+    get_many/set_many группируют ключи по шардам: один MGET или pipeline на шард.
+    Команды над одним ключом (в том числе множества) идут в шард ключа, хеши —
+    в шард по имени хеша, а команды без ключа (clear, keys, close) выполняются
+    во всех шардах. Команды над несколькими ключами (sdiff, smove, ...) работают,
+    только если все ключи в одном шарде, иначе — ShardRoutingError. Её же
+    выбрасывает get_client для команд, не переопределённых здесь, вместо того
+    чтобы молча уйти в первый шард.
+    """
+
+    def __init__(self, server, params: dict[str, Any], backend) -> None:
+        super().__init__(server, params, backend)
+        self._ring = ShardRing(shard_names(self._server, self._options))
+
+    def get_client(self, write=True, tried=None):
+        raise self._unrouted()
+
+    def get_client_with_index(self, write=True, tried=None):
+        raise self._unrouted()
+
+    @staticmethod
+    def _unrouted() -> ShardRoutingError:
+        # Имя команды django-redis, запросившей клиент без ключа
+        command = sys._getframe(2).f_code.co_name
+        return ShardRoutingError(f"ShardedClient.{command}: команда не привязана к ключу — шард неизвестен")
+
+    def get_shard_client(self, key):
+        return self._shard(self._ring.index(str(key)))
+
+    def _group_by_shard(self, keys: Iterable, version=None) -> dict[int, list]:
+        groups = defaultdict(list)
+        for key in keys:
+            groups[self._ring.index(str(self.make_key(key, version=version)))].append(key)
+        return groups
+
+    def _shard_call(self, method: str, key, *args, version=None, client=None, **kwargs):
+        key = self.make_key(key, version=version)
+        if client is None:
+            client = self.get_shard_client(key)
+        return getattr(super(), method)(key, *args, version=version, client=client, **kwargs)
+
+    def _hash_call(self, method: str, name, *args, client=None, **kwargs):
+        # Имя хеша django-redis не префиксует — шард выбирается по нему как есть
+        if client is None:
+            client = self.get_shard_client(name)
+        return getattr(super(), method)(name, *args, client=client, **kwargs)
+
+    def _single_shard(self, command: str, keys: list):
+        indexes = {self._ring.index(str(key)) for key in keys}
+        if len(indexes) != 1:
+            raise ShardRoutingError(f"ShardedClient.{command}: ключи {[str(key) for key in keys]} лежат в разных шардах")
+        return self._shard(indexes.pop())
+
+    def get(self, key, default=None, version=None, client=None):
+        return self._shard_call("get", key, default, version=version, client=client)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None, client=None, nx=False, xx=False):
+        return self._shard_call("set", key, value, timeout, version=version, client=client, nx=nx, xx=xx)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None, client=None):
+        return self._shard_call("add", key, value, timeout, version=version, client=client)
+
+    def delete(self, key, version=None, prefix=None, client=None):
+        return self._shard_call("delete", key, version=version, prefix=prefix, client=client)
+
+    def has_key(self, key, version=None, client=None):
+        return self._shard_call("has_key", key, version=version, client=client)
+
+    def ttl(self, key, version=None, client=None):
+        return self._shard_call("ttl", key, version=version, client=client)
+
+    def expire(self, key, timeout, version=None, client=None):
+        return self._shard_call("expire", key, timeout, version=version, client=client)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None, client=None):
+        return self._shard_call("touch", key, timeout, version=version, client=client)
+
+    def pttl(self, key, version=None, client=None):
+        return self._shard_call("pttl", key, version=version, client=client)
+
+    def persist(self, key, version=None, client=None):
+        return self._shard_call("persist", key, version=version, client=client)
+
+    def pexpire(self, key, timeout, version=None, client=None):
+        return self._shard_call("pexpire", key, timeout, version=version, client=client)
+
+    def expire_at(self, key, when, version=None, client=None):
+        return self._shard_call("expire_at", key, when, version=version, client=client)
+
+    def pexpire_at(self, key, when, version=None, client=None):
+        return self._shard_call("pexpire_at", key, when, version=version, client=client)
+
+    def lock(self, key, version=None, timeout=None, sleep=0.1, blocking=True, blocking_timeout=None,
+             client=None, thread_local=True):
+        return self._shard_call(
+            "lock", key, version=version, timeout=timeout, sleep=sleep, blocking=blocking,
+            blocking_timeout=blocking_timeout, client=client, thread_local=thread_local,
+        )
+
+    def incr(self, key, delta=1, version=None, client=None, ignore_key_check=False):
+        return self._shard_call("incr", key, delta, version=version, client=client, ignore_key_check=ignore_key_check)
+
+    def decr(self, key, delta=1, version=None, client=None):
+        return self._shard_call("decr", key, delta, version=version, client=client)
+
+    def sadd(self, key, *values, version=None, client=None):
+        return self._shard_call("sadd", key, *values, version=version, client=client)
+
+    def srem(self, key, *members, version=None, client=None):
+        return self._shard_call("srem", key, *members, version=version, client=client)
+
+    def scard(self, key, version=None, client=None):
+        return self._shard_call("scard", key, version=version, client=client)
+
+    def smembers(self, key, version=None, client=None):
+        return self._shard_call("smembers", key, version=version, client=client)
+
+    def sismember(self, key, member, version=None, client=None):
+        return self._shard_call("sismember", key, member, version=version, client=client)
+
+    def smismember(self, key, *members, version=None, client=None):
+        return self._shard_call("smismember", key, *members, version=version, client=client)
+
+    def spop(self, key, count=None, version=None, client=None):
+        return self._shard_call("spop", key, count, version=version, client=client)
+
+    def srandmember(self, key, count=None, version=None, client=None):
+        return self._shard_call("srandmember", key, count, version=version, client=client)
+
+    def sscan(self, key, match=None, count=10, version=None, client=None):
+        return self._shard_call("sscan", key, match, count, version=version, client=client)
+
+    def sscan_iter(self, key, match=None, count=10, version=None, client=None):
+        return self._shard_call("sscan_iter", key, match, count, version=version, client=client)
+
+    def smove(self, source, destination, member, version=None, client=None):
+        if client is None:
+            keys = [self.make_key(source, version=version), self.make_key(destination)]
+            client = self._single_shard("smove", keys)
+        return super().smove(source, destination, member, version=version, client=client)
+
+    def sdiff(self, *keys, version=None, client=None):
+        if client is None:
+            client = self._single_shard("sdiff", [self.make_key(key, version=version) for key in keys])
+        return super().sdiff(*keys, version=version, client=client)
+
+    def sinter(self, *keys, version=None, client=None):
+        if client is None:
+            client = self._single_shard("sinter", [self.make_key(key, version=version) for key in keys])
+        return super().sinter(*keys, version=version, client=client)
+
+    def sunion(self, *keys, version=None, client=None):
+        if client is None:
+            client = self._single_shard("sunion", [self.make_key(key, version=version) for key in keys])
+        return super().sunion(*keys, version=version, client=client)
+
+    def sdiffstore(self, dest, *keys, version_dest=None, version_keys=None, client=None):
+        if client is None:
+            all_keys = [self.make_key(dest, version=version_dest)]
+            all_keys += [self.make_key(key, version=version_keys) for key in keys]
+            client = self._single_shard("sdiffstore", all_keys)
+        return super().sdiffstore(dest, *keys, version_dest=version_dest, version_keys=version_keys, client=client)
+
+    def sinterstore(self, dest, *keys, version=None, client=None):
+        if client is None:
+            client = self._single_shard("sinterstore", [self.make_key(key, version=version) for key in (dest, *keys)])
+        return super().sinterstore(dest, *keys, version=version, client=client)
+
+    def sunionstore(self, destination, *keys, version=None, client=None):
+        if client is None:
+            client = self._single_shard(
+                "sunionstore", [self.make_key(key, version=version) for key in (destination, *keys)]
+            )
+        return super().sunionstore(destination, *keys, version=version, client=client)
+
+    def hset(self, name, key, value, version=None, client=None):
+        return self._hash_call("hset", name, key, value, version=version, client=client)
+
+    def hdel(self, name, key, version=None, client=None):
+        return self._hash_call("hdel", name, key, version=version, client=client)
+
+    def hexists(self, name, key, version=None, client=None):
+        return self._hash_call("hexists", name, key, version=version, client=client)
+
+    def hlen(self, name, client=None):
+        return self._hash_call("hlen", name, client=client)
+
+    def hkeys(self, name, client=None):
+        return self._hash_call("hkeys", name, client=client)
+
+    def incr_version(self, key, delta=1, version=None, client=None):
+        # Ключи старой и новой версии могут лежать в разных шардах — RENAME не подходит
+        if version is None:
+            version = self._backend.version
+        value = self.get(key, version=version)
+        if value is None:
+            raise ValueError(f"Key '{key!r}' not found")
+        self.set(key, value, timeout=self.ttl(key, version=version), version=version + delta)
+        self.delete(key, version=version)
+        return version + delta
+
+    def get_many(self, keys, version=None, client=None):
+        found = {}
+        for index, shard_keys in self._group_by_shard(keys, version).items():
+            found.update(super().get_many(shard_keys, version=version, client=self._shard(index)))
+        return OrderedDict((key, found[key]) for key in keys if key in found)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None, client=None):
+        for index, shard_keys in self._group_by_shard(data, version).items():
+            super().set_many(
+                {key: data[key] for key in shard_keys}, timeout, version=version, client=self._shard(index)
+            )
+
+    def delete_many(self, keys, version=None, client=None):
+        deleted = 0
+        for index, shard_keys in self._group_by_shard(keys, version).items():
+            deleted += super().delete_many(shard_keys, version=version, client=self._shard(index))
+        return deleted
+
+    def delete_pattern(self, pattern, version=None, prefix=None, client=None, itersize=None):
+        deleted = 0
+        for index in range(len(self._server)):
+            deleted += super().delete_pattern(
+                pattern, version=version, prefix=prefix, client=self._shard(index), itersize=itersize
+            )
+        return deleted
+
+    def keys(self, search, version=None, client=None):
+        found = []
+        for index in range(len(self._server)):
+            found.extend(super().keys(search, version=version, client=self._shard(index)))
+        return found
+
+    def iter_keys(self, search, itersize=None, client=None, version=None):
+        for index in range(len(self._server)):
+            yield from super().iter_keys(search, itersize=itersize, client=self._shard(index), version=version)
+
+    def clear(self, client=None):
+        for index in range(len(self._server)):
+            super().clear(client=self._shard(index))
+
+    def do_close_clients(self) -> None:
+        # close() (при CLOSE_CONNECTION) закрывает соединения всех открытых шардов
+        for index in range(len(self._server)):
+            self.disconnect(index=index)
+        self._clients = [None] * len(self._server)
+
+    def _shard(self, index: int):
+        if self._clients[index] is None:
+            self._clients[index] = self.connect(index)
+        return self._clients[index]
@@ -3,6 +3,8 @@ from django.utils import timezone
 from rest_framework import exceptions
 from datetime import datetime
 
+from util.cache import adeleted_owners, deleted_owners
+
 
 logger = logging.getLogger("myapp")
 
@@ -18,4 +20,19 @@ def check_note(dead_line: datetime, only_authorized: bool, note_id: str, user: o
         logger.warning(f"Неавторизованный доступ к защищённой заметке {note_id}")
         raise exceptions.PermissionDenied("This note is for authorized users only.")
     
-    return True
\ No newline at end of file
+    return True
+
+
+def check_note_owner(owner_id: str, note_id: str) -> bool:
+    # Аккаунт владельца удаляется — заметка скрыта до фонового удаления
+    if owner_id in deleted_owners([owner_id]):
+        logger.warning(f"Заметка {note_id} принадлежит удаляемому аккаунту.")
+        raise exceptions.NotFound("No Note matches the given query.")
+    return True
+
+
+async def acheck_note_owner(owner_id: str, note_id: str) -> bool:
+    if owner_id in await adeleted_owners([owner_id]):
+        logger.warning(f"Заметка {note_id} принадлежит удаляемому аккаунту.")
+        raise exceptions.NotFound("No Note matches the given query.")
+    return True
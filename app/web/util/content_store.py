@@ -0,0 +1,47 @@
+"""
+Контентно-адресуемое хранение текстов заметок в MinIO.
+
+Объект текста называется по SHA-256 его байтов (sha256-<hex>.txt), поэтому
+одинаковые тексты разных заметок загружаются и хранятся один раз. Ссылки на
+объект — строки Note с этим content; объект удаляется, когда ссылок не
+осталось (tasks.base_tasks.release_note_contents).
+
+Создание ссылки и сборка мусора выполняются под advisory-блокировкой ключа
+в PostgreSQL, чтобы объект не удалили между проверкой его наличия и вставкой
+новой заметки с тем же текстом.
+"""
+import hashlib
+from typing import Iterable
+
+from django.db import connections
+
+CONTENT_KEY_PREFIX = "sha256-"
+
+
+def note_content_key(data: bytes) -> str:
+    """Имя объекта для текста заметки (байты до сжатия кодеком)."""
+    return f"{CONTENT_KEY_PREFIX}{hashlib.sha256(data).hexdigest()}.txt"
+
+
+def is_content_key(name: str) -> bool:
+    """Адресован ли объект по хешу (старые объекты называются {note_id}.txt)."""
+    return name.startswith(CONTENT_KEY_PREFIX)
+
+
+def content_etag(name: str) -> str | None:
+    """Сильный ETag текста по имени объекта; None для объектов, названных не по хешу."""
+    if not is_content_key(name):
+        return None
+    return f'"{name.removeprefix(CONTENT_KEY_PREFIX).removesuffix(".txt")}"'
+
+
+def lock_note_contents(keys: Iterable[str]) -> None:
+    """
+    Берёт advisory-блокировки ключей до конца текущей транзакции в default.
+
+    Ключи блокируются в одном порядке, чтобы параллельные пачки не взаимоблокировались.
+    Вызывать внутри transaction.atomic(using="default").
+    """
+    with connections["default"].cursor() as cursor:
+        for key in sorted(set(keys)):
+            cursor.execute("SELECT pg_advisory_xact_lock(hashtextextended(%s, 0))", [key])
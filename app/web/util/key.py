@@ -4,6 +4,7 @@ import logging
 logger = logging.getLogger("myapp")
 
 FLASK_SIDECAR_URL = "http://localhost:8500/get-key"
+FLASK_SIDECAR_KEYS_URL = "http://localhost:8500/get-keys"
 
 def get_key_from_sidecar() -> str | None:
     """Запрашивает ключ у Flask-sidecar. Возвращает строку или None при ошибке."""
@@ -21,3 +22,19 @@ def get_key_from_sidecar() -> str | None:
     except requests.exceptions.RequestException as e:
         logger.error(f"❌ Ошибка при запросе к sidecar: {e}")
         return None
+
+
+def get_keys_from_sidecar(count: int) -> list[str] | None:
+    """Запрашивает у Flask-sidecar сразу count ключей одним запросом. Возвращает список или None при ошибке."""
+    try:
+        response = requests.get(FLASK_SIDECAR_KEYS_URL, params={"count": count}, timeout=5)
+        response.raise_for_status()
+        keys = response.json().get("keys") or []
+        if len(keys) == count:
+            logger.info(f"✅ Получено ключей от sidecar: {count}")
+            return keys
+        logger.warning(f"⚠️ Sidecar вернул {len(keys)} ключей вместо {count}.")
+        return None
+    except requests.exceptions.RequestException as e:
+        logger.error(f"❌ Ошибка при запросе ключей к sidecar: {e}")
+        return None
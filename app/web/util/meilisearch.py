@@ -10,13 +10,18 @@ import meilisearch.index
 
 logger = logging.getLogger("myapp")
 
+# Ожидаемые настройки индекса заметок
+EXPECTED_SEARCHABLE_ATTRIBUTES = ["id", "content"]
+EXPECTED_DISPLAYED_ATTRIBUTES = ["id", "content"]
+
+
 @lru_cache(maxsize=1)
 def create_meilisearch_client() -> meilisearch.Client:
     """
     Создаёт и возвращает кэшированный Meilisearch клиент.
 
-    Получает конфигурацию из Django settings: URL, API-ключ и имя индекса.
-    Также гарантирует, что индекс существует и настроен.
+    Получает конфигурацию из Django settings: URL и API-ключ.
+    Сетевых запросов не выполняет.
     """
     url: Optional[str] = getattr(settings, "MEILISEARCH_URL", None)
     api_key: Optional[str] = getattr(settings, "MEILISEARCH_API_KEY", None)
@@ -34,17 +39,35 @@ def create_meilisearch_client() -> meilisearch.Client:
         raise e
 
 
-@lru_cache(maxsize=1)
-def get_meilisearch_index(index_name:str=None) -> meilisearch.index:
+def _resolve_index_name(index_name: str = None) -> str:
+    if index_name is None:
+        return getattr(settings, "MEILISEARCH_INDEX_NAME", "notes")
+    return index_name
+
+
+@lru_cache(maxsize=None)
+def get_meilisearch_index(index_name: str = None) -> meilisearch.index.Index:
     """
-    Возвращает объект индекса Meilisearch.
+    Возвращает объект индекса Meilisearch без обращения к серверу.
 
-    Если индекс не существует, создаёт его.
-    Также проверяет и при необходимости применяет настройки (searchable и displayed attributes).
+    Индекс должен быть заранее создан и настроен через
+    `python manage.py init_meilisearch` (см. ensure_meilisearch_index).
     """
     client = create_meilisearch_client()
-    if index_name == None:
-        index_name: str = getattr(settings, "MEILISEARCH_INDEX_NAME", "notes")
+    return client.index(_resolve_index_name(index_name))
+
+
+def ensure_meilisearch_index(index_name: str = None) -> bool:
+    """
+    Создаёт индекс, если он не существует, и применяет настройки
+    (searchable и displayed attributes), если они отличаются.
+
+    Вызывается один раз при развёртывании, а не в рабочих процессах.
+
+    :return: True если настройки были обновлены, иначе False
+    """
+    client = create_meilisearch_client()
+    index_name = _resolve_index_name(index_name)
 
     try:
         index = client.index(index_name)
@@ -61,26 +84,23 @@ def get_meilisearch_index(index_name:str=None) -> meilisearch.index:
             current_settings = index.get_settings()
 
         # Применим настройки, только если они отличаются
-        expected_searchable = ["id", "content"]
-        expected_displayed = ["id", "content"]
-
         update_needed = (
-            current_settings.get("searchableAttributes") != expected_searchable or
-            current_settings.get("displayedAttributes") != expected_displayed
+            current_settings.get("searchableAttributes") != EXPECTED_SEARCHABLE_ATTRIBUTES or
+            current_settings.get("displayedAttributes") != EXPECTED_DISPLAYED_ATTRIBUTES
         )
 
         if update_needed:
             logger.info("Updating Meilisearch index settings...")
-            task1 = index.update_searchable_attributes(expected_searchable)
+            task1 = index.update_searchable_attributes(EXPECTED_SEARCHABLE_ATTRIBUTES)
             index.wait_for_task(task1.task_uid)
 
-            task2 = index.update_displayed_attributes(expected_displayed)
+            task2 = index.update_displayed_attributes(EXPECTED_DISPLAYED_ATTRIBUTES)
             index.wait_for_task(task2.task_uid)
             logger.info("Meilisearch index settings updated.")
         else:
             logger.info("Meilisearch index already has correct settings. Skipping update.")
 
-        return index
+        return update_needed
 
     except (MeilisearchApiError, MeilisearchCommunicationError) as e:
         logger.exception("Failed to initialize or configure Meilisearch index.")
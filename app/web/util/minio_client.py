@@ -1,12 +1,37 @@
 import boto3
 import logging
+from contextlib import closing
+from concurrent.futures import ThreadPoolExecutor
 from django.conf import settings
 from functools import lru_cache
 from botocore.exceptions import BotoCoreError, NoCredentialsError, ClientError
 
+from util.note_codec import (
+    ENCODING_METADATA_KEY,
+    SIZE_METADATA_KEY,
+    decode_note_body,
+    encode_note_body,
+    encoding_parameters,
+)
+
 # Получаем логгер Django
 logger = logging.getLogger("myapp")
 
+def _create_minio_client(endpoint_url: str, **config):
+    session = boto3.session.Session()
+    return session.client(
+        service_name="s3",
+        endpoint_url=endpoint_url,
+        aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+        aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+        verify=settings.AWS_S3_VERIFY,
+        config=boto3.session.Config(
+            s3={"addressing_style": settings.AWS_S3_ADDRESSING_STYLE},
+            **config
+        )
+    )
+
+
 @lru_cache(maxsize=1)
 def get_minio_client():
     """
@@ -15,22 +40,181 @@ def get_minio_client():
     """
     try:
         logger.debug("Инициализация MinIO клиента...")
-
-        session = boto3.session.Session()
-        client = session.client(
-            service_name="s3",
-            endpoint_url=settings.AWS_S3_ENDPOINT_URL,
-            aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-            verify=settings.AWS_S3_VERIFY,
-            config=boto3.session.Config(
-                s3={"addressing_style": settings.AWS_S3_ADDRESSING_STYLE}
-            )
-        )
-
+        client = _create_minio_client(settings.AWS_S3_ENDPOINT_URL)
         logger.info("MinIO клиент успешно создан.")
         return client
 
     except (BotoCoreError, NoCredentialsError, ClientError) as e:
         logger.exception("Ошибка при создании MinIO клиента: %s", str(e))
         raise
+
+
+@lru_cache(maxsize=1)
+def get_minio_presign_client():
+    """
+    Клиент для подписи ссылок: адрес MinIO входит в подпись, поэтому подписываем
+    адрес, доступный клиентам (MINIO_PUBLIC_ENDPOINT_URL), а не внутренний.
+    """
+    return _create_minio_client(settings.MINIO_PUBLIC_ENDPOINT_URL, signature_version="s3v4")
+
+
+def presigned_note_url(key: str) -> str:
+    """Короткоживущая ссылка на скачивание объекта заметки прямо из MinIO (подписывается локально, без запроса)."""
+    return get_minio_presign_client().generate_presigned_url(
+        "get_object",
+        Params={
+            "Bucket": settings.AWS_STORAGE_BUCKET_NAME,
+            "Key": key,
+            "ResponseContentType": "text/plain; charset=utf-8",
+        },
+        ExpiresIn=settings.NOTE_PRESIGNED_URL_EXPIRES,
+    )
+
+
+def upload_note_contents(contents: dict[str, str], max_workers: int = 16) -> int:
+    """
+    Параллельно загружает тексты заметок в MinIO (сжатыми кодеком NOTE_STORAGE_CODEC).
+
+    Ключи адресованы по хешу текста (util.content_store), поэтому уже
+    хранящиеся тексты не загружаются повторно. boto3-клиент потокобезопасен,
+    поэтому пачка обрабатывается одним пулом потоков. Исключение первой
+    неудачной загрузки пробрасывается вызывающему.
+
+    :param contents: ключ объекта -> текст заметки
+    :param max_workers: Сколько загрузок выполнять одновременно
+    :return: Сколько объектов загружено (остальные уже были в MinIO)
+    """
+    client = get_minio_client()
+    bucket_name = settings.AWS_STORAGE_BUCKET_NAME
+
+    def upload(item: tuple[str, str]) -> bool:
+        key, text = item
+        try:
+            client.head_object(Bucket=bucket_name, Key=key)
+            return False
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") not in ("404", "NoSuchKey", "NotFound"):
+                raise
+
+        data = text.encode("utf-8")
+        body, encoding = encode_note_body(data)
+        client.put_object(
+            Bucket=bucket_name,
+            Key=key,
+            Body=body,
+            ContentType="text/plain",
+            **encoding_parameters(encoding, len(data)),
+        )
+        return True
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(contents)) or 1) as executor:
+        uploaded = sum(executor.map(upload, contents.items()))
+    logger.info(f"Загружено в MinIO файлов: {uploaded} из {len(contents)}")
+    return uploaded
+
+
+def read_note_body(key: str) -> bytes:
+    """Текст заметки из MinIO одним GET, разжатый по метке кодировки объекта."""
+    obj = get_minio_client().get_object(Bucket=settings.AWS_STORAGE_BUCKET_NAME, Key=key)
+    with closing(obj["Body"]) as body:
+        return decode_note_body(body.read(), object_encoding(obj))
+
+
+def object_encoding(obj: dict) -> str | None:
+    """Кодировка объекта из ответа get_object/head_object (None — несжатый)."""
+    return obj.get("Metadata", {}).get(ENCODING_METADATA_KEY)
+
+
+def object_text_size(obj: dict) -> int | None:
+    """Размер разжатого текста сжатого объекта (None — объект записан без метки размера)."""
+    size = obj.get("Metadata", {}).get(SIZE_METADATA_KEY)
+    return int(size) if size is not None else None
+
+
+# Размер куска при потоковой отдаче объекта из MinIO (байт)
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def open_note_object(key: str, byte_range: str | None = None) -> dict:
+    """
+    Открывает объект заметки в MinIO для потокового чтения, не загружая его целиком.
+
+    :param key: Имя объекта (note.content.name)
+    :param byte_range: Значение HTTP Range ("bytes=0-99"), передаётся в MinIO как есть
+    :return: Ответ get_object: Body (StreamingBody), ContentLength, ContentRange
+    """
+    params = {"Bucket": settings.AWS_STORAGE_BUCKET_NAME, "Key": key}
+    if byte_range:
+        params["Range"] = byte_range
+    return get_minio_client().get_object(**params)
+
+
+def note_object_size(key: str) -> int:
+    """Размер объекта заметки в байтах (HEAD без чтения тела)."""
+    return get_minio_client().head_object(Bucket=settings.AWS_STORAGE_BUCKET_NAME, Key=key)["ContentLength"]
+
+
+def iter_object_body(body, chunk_size: int = STREAM_CHUNK_SIZE):
+    """Отдаёт тело объекта кусками и закрывает соединение с MinIO по окончании или обрыве клиента."""
+    try:
+        yield from body.iter_chunks(chunk_size=chunk_size)
+    finally:
+        body.close()
+
+
+def create_note_upload(key: str, size: int) -> tuple[str, list[dict]]:
+    """
+    Начинает multipart-загрузку объекта заметки и подписывает ссылки на каждую часть.
+
+    Клиент загружает части PUT-запросами прямо в MinIO, минуя Django.
+
+    :param key: Имя объекта
+    :param size: Заявленный размер тела в байтах
+    :return: (UploadId, [{"part_number": n, "url": ...}])
+    """
+    bucket_name = settings.AWS_STORAGE_BUCKET_NAME
+    upload_id = get_minio_client().create_multipart_upload(
+        Bucket=bucket_name, Key=key, ContentType="text/plain"
+    )["UploadId"]
+
+    part_count = max(1, -(-size // settings.NOTE_UPLOAD_PART_SIZE))
+    presign_client = get_minio_presign_client()
+    parts = [
+        {
+            "part_number": part_number,
+            "url": presign_client.generate_presigned_url(
+                "upload_part",
+                Params={"Bucket": bucket_name, "Key": key, "UploadId": upload_id, "PartNumber": part_number},
+                ExpiresIn=settings.NOTE_UPLOAD_EXPIRES,
+            ),
+        }
+        for part_number in range(1, part_count + 1)
+    ]
+    return upload_id, parts
+
+
+def complete_note_upload(key: str, upload_id: str, parts: list[dict]) -> int:
+    """
+    Собирает загруженные части в объект и возвращает его итоговый размер в байтах.
+
+    :param parts: [{"part_number": n, "etag": ...}] — ETag из ответов MinIO на PUT частей
+    """
+    bucket_name = settings.AWS_STORAGE_BUCKET_NAME
+    client = get_minio_client()
+    client.complete_multipart_upload(
+        Bucket=bucket_name,
+        Key=key,
+        UploadId=upload_id,
+        MultipartUpload={
+            "Parts": [
+                {"PartNumber": part["part_number"], "ETag": part["etag"]}
+                for part in sorted(parts, key=lambda part: part["part_number"])
+            ]
+        },
+    )
+    return note_object_size(key)
+
+
+def abort_note_upload(key: str, upload_id: str) -> None:
+    """Отменяет multipart-загрузку; MinIO удаляет уже загруженные части."""
+    get_minio_client().abort_multipart_upload(Bucket=settings.AWS_STORAGE_BUCKET_NAME, Key=key, UploadId=upload_id)
@@ -0,0 +1,205 @@
+"""
+Кодек хранения текстов заметок в MinIO (settings.NOTE_STORAGE_CODEC).
+
+Текст сжимается при записи (NoteStorage, upload_note_contents) и прозрачно
+разжимается при чтении (read_note_body). Кодировка хранится в метаданных
+объекта (x-amz-meta-note-encoding); объекты без метки несжатые, поэтому
+заметки, сохранённые до включения кодека, читаются как прежде. Рядом хранится
+размер разжатого текста (x-amz-meta-note-size): по нему потоковая отдача
+(iter_decode_note_body) отвечает на Range, не разжимая объект заранее.
+
+- zstd: тексты до NOTE_ZSTD_DICT_MAX_SIZE сжимаются с обученным словарём
+  NOTE_ZSTD_DICT_ID, более длинные — без словаря. Словари хранятся в том же
+  бакете MinIO по dict_id (zstd-dicts/<dict_id>.dict), поэтому объект читается
+  в любом поде, сколько бы раз словарь ни переобучали
+- gzip: без словаря; объект также получает Content-Encoding: gzip,
+  поэтому скачивание по подписанной ссылке HTTP-клиент разожмёт сам
+- none: хранить как есть
+"""
+import gzip
+import zlib
+from contextlib import closing
+from functools import lru_cache
+from typing import Iterable, Iterator
+
+import pyzstd
+from botocore.exceptions import ClientError
+from django.conf import settings
+from django.core.files.base import ContentFile
+from storages.backends.s3boto3 import S3Boto3Storage
+
+from util.content_store import is_content_key
+
+# Пользовательские метаданные объекта с его кодировкой (x-amz-meta-note-encoding)
+ENCODING_METADATA_KEY = "note-encoding"
+# Размер разжатого текста сжатого объекта (x-amz-meta-note-size)
+SIZE_METADATA_KEY = "note-size"
+
+IDENTITY = "identity"
+GZIP = "gzip"
+ZSTD = "zstd"
+ZSTD_DICT_PREFIX = "zstd-dict:"
+
+ZSTD_LEVEL = 3
+GZIP_LEVEL = 6
+
+
+ZSTD_DICT_KEY_PREFIX = "zstd-dicts/"
+
+
+def zstd_dict_key(dict_id: int) -> str:
+    """Объект MinIO со словарём zstd."""
+    return f"{ZSTD_DICT_KEY_PREFIX}{dict_id}.dict"
+
+
+@lru_cache(maxsize=None)
+def zstd_dict(dict_id: int) -> pyzstd.ZstdDict:
+    """
+    Словарь zstd по dict_id из MinIO (загружается один раз на процесс).
+
+    Словари не удаляются: объекты, сжатые прежними словарями, должны читаться
+    и после переобучения.
+    """
+    from util.minio_client import get_minio_client
+
+    try:
+        obj = get_minio_client().get_object(Bucket=settings.AWS_STORAGE_BUCKET_NAME, Key=zstd_dict_key(dict_id))
+        with closing(obj["Body"]) as body:
+            zstd_dict = pyzstd.ZstdDict(body.read())
+    except ClientError as e:
+        raise ValueError(f"Словарь zstd {dict_id} не найден в MinIO: {e}") from e
+    if zstd_dict.dict_id != dict_id:
+        raise ValueError(f"Объект {zstd_dict_key(dict_id)} содержит словарь {zstd_dict.dict_id}")
+    return zstd_dict
+
+
+def store_zstd_dict(dict_content: bytes) -> int:
+    """Сохраняет обученный словарь в MinIO и возвращает его dict_id."""
+    from util.minio_client import get_minio_client
+
+    dict_id = pyzstd.ZstdDict(dict_content).dict_id
+    get_minio_client().put_object(
+        Bucket=settings.AWS_STORAGE_BUCKET_NAME, Key=zstd_dict_key(dict_id), Body=dict_content
+    )
+    return dict_id
+
+
+def encode_note_body(data: bytes) -> tuple[bytes, str]:
+    """Сжимает текст заметки кодеком NOTE_STORAGE_CODEC; возвращает (байты, кодировка)."""
+    codec = settings.NOTE_STORAGE_CODEC
+    if codec == "none" or len(data) < settings.NOTE_COMPRESS_MIN_SIZE:
+        return data, IDENTITY
+
+    if codec == "gzip":
+        encoded, encoding = gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0), GZIP
+    elif codec == "zstd":
+        write_dict = None
+        if settings.NOTE_ZSTD_DICT_ID and len(data) <= settings.NOTE_ZSTD_DICT_MAX_SIZE:
+            write_dict = zstd_dict(settings.NOTE_ZSTD_DICT_ID)
+        # Переваренный словарь кэшируется pyzstd: без него каждое сжатие заново готовит словарь
+        encoded = pyzstd.compress(data, ZSTD_LEVEL, write_dict.as_digested_dict if write_dict else None)
+        encoding = f"{ZSTD_DICT_PREFIX}{write_dict.dict_id}" if write_dict else ZSTD
+    else:
+        raise ValueError(f"Неизвестный кодек хранения заметок: {codec}")
+
+    # Несжимаемый текст выгоднее хранить как есть
+    if len(encoded) >= len(data):
+        return data, IDENTITY
+    return encoded, encoding
+
+
+def decode_note_body(data: bytes, encoding: str | None) -> bytes:
+    """Разжимает тело объекта по метке кодировки (None — объект без метки)."""
+    if not encoding or encoding == IDENTITY:
+        return data
+    if encoding == GZIP:
+        return gzip.decompress(data)
+    if encoding == ZSTD:
+        return pyzstd.decompress(data)
+    if encoding.startswith(ZSTD_DICT_PREFIX):
+        return pyzstd.decompress(data, zstd_dict(int(encoding.removeprefix(ZSTD_DICT_PREFIX))))
+    raise ValueError(f"Неизвестная кодировка заметки: {encoding}")
+
+
+def iter_decode_note_body(chunks: Iterable[bytes], encoding: str | None, chunk_size: int) -> Iterator[bytes]:
+    """
+    Потоково разжимает тело объекта по метке кодировки.
+
+    Каждый кусок на выходе не длиннее chunk_size, поэтому память не зависит
+    ни от размера текста, ни от степени его сжатия.
+    """
+    if not encoding or encoding == IDENTITY:
+        yield from chunks
+        return
+
+    if encoding == GZIP:
+        decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        for data in chunks:
+            while True:
+                out = decoder.decompress(data, chunk_size)
+                data = decoder.unconsumed_tail
+                if out:
+                    yield out
+                if not data and len(out) < chunk_size:
+                    break
+        tail = decoder.flush()
+        if tail:
+            yield tail
+        return
+
+    if encoding == ZSTD:
+        decoder = pyzstd.ZstdDecompressor()
+    elif encoding.startswith(ZSTD_DICT_PREFIX):
+        decoder = pyzstd.ZstdDecompressor(zstd_dict(int(encoding.removeprefix(ZSTD_DICT_PREFIX))))
+    else:
+        raise ValueError(f"Неизвестная кодировка заметки: {encoding}")
+    for data in chunks:
+        while not decoder.eof:
+            out = decoder.decompress(data, chunk_size)
+            data = b""
+            if out:
+                yield out
+            if decoder.needs_input:
+                break
+
+
+def encoding_parameters(encoding: str, size: int) -> dict:
+    """Параметры put_object, помечающие объект кодировкой и размером разжатого текста."""
+    if encoding == IDENTITY:
+        return {}
+    params = {"Metadata": {ENCODING_METADATA_KEY: encoding, SIZE_METADATA_KEY: str(size)}}
+    if encoding == GZIP:
+        params["ContentEncoding"] = "gzip"
+    return params
+
+
+def train_zstd_dict(samples: list[bytes], dict_size: int) -> bytes:
+    """Обучает словарь zstd на выборке текстов заметок."""
+    return pyzstd.train_dict(samples, dict_size).dict_content
+
+
+class NoteStorage(S3Boto3Storage):
+    """
+    S3Boto3Storage, сжимающий тексты заметок кодеком NOTE_STORAGE_CODEC при записи.
+
+    Объект с ключом по хешу (util.content_store) не загружается повторно, если уже есть.
+    """
+
+    def _save(self, name, content):
+        if is_content_key(name) and self.exists(name):
+            return name
+        content.seek(0)
+        data = content.read()
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        encoded, encoding = encode_note_body(data)
+        encoded_content = ContentFile(encoded)
+        encoded_content.note_encoding = encoding
+        encoded_content.note_size = len(data)
+        return super()._save(name, encoded_content)
+
+    def _get_write_parameters(self, name, content=None):
+        params = super()._get_write_parameters(name, content)
+        encoding = getattr(content, "note_encoding", IDENTITY)
+        params.update(encoding_parameters(encoding, getattr(content, "note_size", 0)))
+        return params
@@ -49,6 +49,11 @@ helm upgrade --install my-redis oci://registry-1.docker.io/bitnamicharts/redis \
   --namespace redis \
   --create-namespace
 
+helm upgrade --install my-redis-cache oci://registry-1.docker.io/bitnamicharts/redis \
+  -f my_redis/redis-cache-values.yaml \
+  --namespace redis \
+  --create-namespace
+
 echo "========================= 🐘 Установка PostgreSQL-оператора ========================="
 
 helm upgrade --install postgres-operator postgres-operator-charts/postgres-operator \
@@ -78,6 +83,7 @@ kubectl apply -f app/secret.yaml
 kubectl apply -f app/app.yaml
 kubectl apply -f app/ServiceMonitor.yaml
 kubectl apply -f celery/celery-worker-deployment.yaml
+kubectl apply -f celery/celery-keda.yaml
 
 echo "========================= 🚪 Port-forwarding сервисов ========================="
 